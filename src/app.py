@@ -1,6 +1,8 @@
 #! /usr/bin/env python3
 
+import json
 import shutil
+from datetime import timedelta
 from pathlib import Path
 
 import click
@@ -8,88 +10,180 @@ import pandas as pd
 from jinja2 import Environment, FileSystemLoader
 from termcolor import colored
 from importlib_resources import files
+from qc_eda.basic.duplicates import find_duplicates, duplicates_table as render_duplicates
 from qc_eda.basic.numerical_data import overview, column_overview, numeric_columns, categorical_columns
+from qc_eda.basic.schema import Schema, column_schema, infer_schema
 from qc_eda.biological.biological_data import dna_rna_columns, protein_columns
-from qc_eda.biological.functional_annotation import annotation_flags
+from qc_eda.biological.functional_annotation import ReferenceVocabulary, annotation_flags, get_vocabulary
 from qc_eda.biological.measurement_data import measurement_columns
 from qc_eda.biological.taxonomy import taxonomy_flags
-from utils.download_metadata import get_tax_ids
-from utils.file_reader import read_file
-from qc_eda.basic.general import general_plots
+from utils.cache import configure as configure_cache
+from utils.download_metadata import get_taxonomy_index, get_clusters_of_orthologous_groups, get_gene_ontology
+from utils.file_reader import read_file, iter_batches, resumable, ColumnTypesChanged
+from utils.plot_utils import write_plotlyjs
+from utils.profile_io import Profile, read_profile, write_profile
+from utils.taxonomy_index import TaxonomyIndex
+from utils.result_cache import ResultCache, column_digest, map_cached, result_key
+from qc_eda.basic.correlation import METHODS as CORRELATION_METHODS, correlations as compute_correlations
+from qc_eda.basic.general import general_plots, GeneralPlots, missing_values_barchart
+from qc_eda.basic.streaming import profile_batches, stream_state, appended_offset
 
 CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
 TEMPLATE_DIR = files("templates").joinpath()
 STATIC_DIR = files("static").joinpath()
+# Tables with more columns get one file per column card, loaded on demand by the columns page
+SPLIT_COLUMNS = 100
 env = Environment(loader=FileSystemLoader(str(TEMPLATE_DIR)), autoescape=True)
 
 
 @click.group(context_settings=CONTEXT_SETTINGS, invoke_without_command=True)
-@click.option("-i", "--input", type=click.Path(exists=True, resolve_path=True), required=True,
+@click.option("-i", "--input", type=click.Path(exists=True, resolve_path=True),
               help="Input file as .tsv, .csv or .json", )
 @click.option('-t','--tax', is_flag=True,help='Enable taxonomy analysis')
 @click.option('-f', '--func', type=click.Choice(['cog','go']), help='Enable functional annotation analysis. Choose between cog or go')
 @click.option('-tc', '--target_column', type=str, help='Target column for Analysis')
-def cli(input: str, tax: bool = False, func: str = None, target_column: str = None):
+@click.option('--cache-dir', type=click.Path(file_okay=False), envvar='BIOPROFILEKIT_CACHE',
+              help='Directory for cached reference data (default: ~/.cache/bioprofilekit)')
+@click.option('--offline', is_flag=True, help='Only use cached reference data, never access the network')
+@click.option('-j', '--jobs', type=int, default=1, show_default=True,
+              help='Number of parallel workers for the column analysis, 0 uses all cores')
+@click.option('--approx', is_flag=True,
+              help='Use sketches for quantiles, MAD and unique counts of very large columns, the error bound is shown in the report')
+@click.option('--stream', is_flag=True,
+              help='Read the input in batches and compute mergeable statistics, for files larger than memory')
+@click.option('--batch-size', type=click.IntRange(min=1), default=100_000, show_default=True,
+              help='Rows per batch in streaming mode')
+@click.option('--split-columns', type=click.IntRange(min=0), default=SPLIT_COLUMNS, show_default=True,
+              help='Write one file per column card and load the cards on demand when the table has more columns '
+                   'than this, 0 always splits')
+@click.option('--incremental', is_flag=True,
+              help='Reuse cached results of unchanged columns from earlier runs, with --stream only rows appended '
+                   'since the last run are read')
+@click.option('--profile-out', type=click.Path(file_okay=False, writable=True),
+              help='Also store all results in this directory as Parquet tables and a JSON manifest, see the render command')
+@click.option('--usecols', type=str, help='Comma separated list of the columns to read, all by default')
+@click.option('--dtype', 'dtypes', type=str, multiple=True, metavar='COLUMN=TYPE',
+              help='Read a column with this type instead of the inferred one, e.g. taxid=string or group=category. '
+                   'Can be given more than once')
+@click.option('--correlation', type=click.Choice(CORRELATION_METHODS), default='pearson', show_default=True,
+              help="Correlation shown in the heatmap and on the column cards, cramers_v compares columns with at "
+                   "most 100 categories")
+@click.pass_context
+def cli(ctx: click.Context, input: str, tax: bool = False, func: str = None, target_column: str = None,
+        cache_dir: str = None, offline: bool = False, jobs: int = 1, approx: bool = False, stream: bool = False,
+        batch_size: int = 100_000, split_columns: int = SPLIT_COLUMNS, incremental: bool = False,
+        profile_out: str = None, usecols: str = None, dtypes: tuple[str, ...] = (), correlation: str = 'pearson'):
+    configure_cache(cache_dir, offline)
+    if ctx.invoked_subcommand is not None:
+        return
+    if input is None:
+        raise click.UsageError("Missing option '-i' / '--input'.", ctx=ctx)
+
     input_path = Path(input)
-    print(colored(f'Reading file {input_path.name}', 'green'))
+    cache = ResultCache() if incremental else None
+    columns = usecols.split(',') if usecols else None
+    types = parse_dtypes(dtypes, ctx)
+    if stream:
+        print(colored(f'Streaming file {input_path.name} in batches of {batch_size} rows', 'green'))
+        if tax or func:
+            print(colored('Taxonomy and functional annotation analysis are skipped in streaming mode', 'yellow'))
+        # Compressed files and JSON documents cannot be resumed at a byte offset, they are always read completely
+        resume = cache is not None and resumable(input_path)
+        state_key = result_key("stream", str(input_path.resolve()), columns, types)
+        state = cache.get(state_key) if resume else None
+        start = appended_offset(input_path, state)
+        size = input_path.stat().st_size
+        read_types = types
+        while True:
+            try:
+                if start is None:
+                    profile = profile_batches(iter_batches(input_path, batch_size, usecols=columns, dtypes=read_types),
+                                              input_path.name)
+                else:
+                    print(colored(f'Reading {size - start} bytes appended since the last run', 'green'))
+                    batches = iter_batches(input_path, batch_size, start, columns, read_types) if size > start else []
+                    profile = profile_batches(batches, input_path.name, state.accumulators)
+                break
+            except ColumnTypesChanged as changed:
+                # Batches that were already profiled used the old types, so the whole file is read again
+                print(colored(f'{changed}, reading the file again with them as text', 'yellow'))
+                read_types = {**(read_types or {}), **changed.types}
+                start = None
+        if resume and input_path.stat().st_size == size:
+            cache.put(state_key, stream_state(input_path, profile.accumulators, size))
+        plots = GeneralPlots(missing_values_barchart=missing_values_barchart(profile.missing))
+        write_report(profile.general, "", plots, profile.columns, profile.numeric, profile.categorical,
+                     split_columns)
+        if profile_out:
+            save_profile(Path(profile_out), Profile(profile.general, "", plots, profile.columns, profile.numeric,
+                                                    profile.categorical), input_path.name)
+        return
 
-    df = read_file(input_path)
-    general = overview(df, input_path.name)
-    plots = general_plots(df, target_column)
+    print(colored(f'Reading file {input_path.name}', 'green'))
 
-    dups = df[df.duplicated(keep=False)]
-    dups = dups.reset_index()
-    duplicates_table = dups.to_html(classes="table table-hover table-responsive nowrap", border="0",
-                                    table_id="dup_table",
-                                    index=False)
+    df = read_file(input_path, columns, types)
+    schema = infer_schema(df)
+    duplicates = find_duplicates(df)
+    general = overview(df, input_path.name, duplicates)
+    correlations = compute_correlations(df, correlation)
+    plots = general_plots(df, target_column, correlations)
+    duplicates_table = render_duplicates(duplicates)
     print(colored(f'Analyse {len(df.columns)} columns', 'blue'))
 
-    column_overviews = [column_overview(df, col) for col in df.columns]
-
-    tax_df = None
+    tax_index = None
     if tax:
-        tax_df = get_tax_ids()
+        tax_index = get_taxonomy_index()
+    vocabulary = get_vocabulary(func) if func else None
+
+    numeric_cols = schema.numeric
+    digests = {col: column_digest(df[col]) for col in df.columns} if cache else None
+    column_overviews = map_cached(profile_column, df, df.columns, jobs, cache, digests,
+                                  tax_index=tax_index, vocabulary=vocabulary, approx=approx, schema=schema)
     for col_overview in column_overviews:
-        if tax and tax_df is not None:
-            col_overview.taxonomy = taxonomy_flags(df, col_overview.name, tax_df)
-        if func and tax_df is not None:
-            col_overview.annotation = [annotation_flags(df, col_overview.name, func)]
-        if hasattr(col_overview, "top_10") and isinstance(col_overview.top_10, pd.Series):
-            col_overview.top_10_items = list(col_overview.top_10.items())
-        if col_overview.sequence == 'dna':
-            print(colored(f'Analyzing DNA/RNA sequences in column: {col_overview.name}', 'cyan'))
-            bio_data = dna_rna_columns(df[col_overview.name])
-            col_overview.dna_rna_data = bio_data
-        elif col_overview.sequence == 'protein':
-            print(colored(f'Analyzing protein sequences in column: {col_overview.name}', 'cyan'))
-            bio_data = protein_columns(df[col_overview.name])
-            col_overview.protein_data = bio_data
-        else:
-            col_overview.dna_rna_data = None
-            col_overview.protein_data = None
-
-        if col_overview.sequence == 'None':
-            measurement_data = measurement_columns(col_overview, df)
-            if measurement_data:
-                print(colored(f'Analyzing lab measurements in column: {col_overview.name}', 'cyan'))
-                col_overview.measurement_data = measurement_data
-            else:
-                col_overview.measurement_data = None
-        else:
-            col_overview.measurement_data = None
+        col_overview.correlation = correlations.related.get(col_overview.name)
+        schema.record(col_overview, func)
 
-    print(colored(f'Analyse {len(df.select_dtypes(include="number").columns)} numeric columns ', 'blue'))
+    print(colored(f'Analyse {len(numeric_cols)} numeric columns ', 'blue'))
 
-    numeric_overviews = [numeric_columns(df, col) for col in df.select_dtypes(include='number').columns]
+    numeric_overviews = map_cached(numeric_columns, df, numeric_cols, jobs, cache, digests, approx=approx)
 
-    cat_columns = [col for col in df.select_dtypes(include=['object', 'bool', 'int64', 'float64']).columns if
-                   any(i.sequence == 'None' for i in column_overviews if i.name == col)]
+    cat_columns = schema.categorical
     print(colored(f'Analyse {len(cat_columns)} object columns ', 'blue'))
-    categorical_overviews = [categorical_columns(df, col) for col in cat_columns]
+    categorical_overviews = map_cached(categorical_columns, df, cat_columns, jobs, cache, digests, approx=approx)
+    if cache:
+        print(colored(f'Reused {cache.hits} cached column results, computed {cache.misses}', 'green'))
+    print(colored('Column types: ' + ', '.join(f'{count} {tag}' for tag, count in schema.summary().most_common()), 'blue'))
+
+    write_report(general, duplicates_table, plots, column_overviews, numeric_overviews, categorical_overviews,
+                 split_columns)
+    if profile_out:
+        save_profile(Path(profile_out), Profile(general, duplicates_table, plots, column_overviews, numeric_overviews,
+                                                categorical_overviews), input_path.name)
+
+
+def parse_dtypes(dtypes: tuple[str, ...], ctx: click.Context) -> dict[str, str] | None:
+    types = {}
+    for item in dtypes:
+        col, sep, name = item.rpartition('=')
+        if not sep or not col:
+            raise click.BadParameter(f"expected COLUMN=TYPE, got '{item}'", ctx=ctx, param_hint="'--dtype'")
+        types[col] = name.strip()
+    return types or None
+
+
+def save_profile(directory: Path, profile: Profile, source: str):
+    print(colored(f'Writing profile to {directory}', 'green'))
+    write_profile(directory, profile, source)
 
+
+def write_report(general, duplicates_table, plots, column_overviews, numeric_overviews, categorical_overviews,
+                 split_columns: int = SPLIT_COLUMNS):
     Path("renders").mkdir(parents=True, exist_ok=True)
 
     shutil.copytree(str(STATIC_DIR), "renders/static/", dirs_exist_ok=True)
+    write_plotlyjs(Path("renders/static/js"))
+    # Column cards of an earlier, wider report must not be picked up by this one
+    shutil.rmtree("renders/columns", ignore_errors=True)
 
     landing_template = env.get_template('LandingPage.jinja')
     numeric_template = env.get_template('numeric_overview.jinja')
@@ -103,8 +197,93 @@ def cli(input: str, tax: bool = False, func: str = None, target_column: str = No
     with open("renders/numeric_data.html", "w",encoding="utf-8") as output:
         print(numeric_template.render(general=general, dups=duplicates_table), file=output)
 
-    with open("renders/columns.html", "w",encoding="utf-8") as output:
-        print(columns.render(columns=column_overviews, overview=numeric_overviews, categorical=categorical_overviews), file=output)
+    if len(column_overviews) > split_columns:
+        print(colored(f'Writing {len(column_overviews)} column cards to renders/columns', 'green'))
+        write_column_cards(Path("renders/columns"), column_overviews, numeric_overviews, categorical_overviews)
+        with open("renders/columns.html", "w", encoding="utf-8") as output:
+            print(env.get_template('columns_index.jinja').render(total=len(column_overviews)), file=output)
+    else:
+        with open("renders/columns.html", "w",encoding="utf-8") as output:
+            print(columns.render(columns=column_overviews, overview=numeric_overviews, categorical=categorical_overviews), file=output)
 
     with open("renders/general_statistics.html", "w",encoding="utf-8") as output:
         print(stats.render(plots=plots), file=output)
+
+
+def write_column_cards(directory: Path, column_overviews, numeric_overviews, categorical_overviews):
+    # One script per card that hands the rendered card to static/js/column_shards.js, plus a small index for the search
+    directory.mkdir(parents=True, exist_ok=True)
+    card = env.get_template('column_card.jinja')
+    numeric = {ov.name: ov for ov in numeric_overviews}
+    categorical = {cat.name: cat for cat in categorical_overviews}
+    index = []
+    for i, col in enumerate(column_overviews):
+        html = card.render(col=col, index=i, visible=True,
+                           overview=[numeric[col.name]] if col.name in numeric else [],
+                           categorical=[categorical[col.name]] if col.name in categorical else [])
+        (directory / f"{i}.js").write_text(f"window.columnLoaded({i}, {json.dumps(html)});\n", encoding="utf-8")
+        index.append({
+            "name": col.name,
+            "title": col.name.replace('_', ' ').title(),
+            "anchor": "multiCollapse" + col.name.replace(' ', '').capitalize(),
+            "type": col.type,
+        })
+    (directory / "index.js").write_text(f"window.COLUMN_INDEX = {json.dumps(index)};\n", encoding="utf-8")
+
+
+def profile_column(df: pd.DataFrame, col, tax_index: TaxonomyIndex | None = None,
+                   vocabulary: ReferenceVocabulary | None = None, approx: bool = False, schema: Schema | None = None):
+    column = schema[col] if schema is not None else column_schema(df[col])
+    col_overview = column_overview(df, col, approx, column.sequence, column.sequence_error)
+    if tax_index is not None and column.taxonomy_candidate:
+        col_overview.taxonomy = taxonomy_flags(df, col_overview.name, tax_index, column)
+    if vocabulary is not None and column.annotation_candidate:
+        col_overview.annotation = annotation_flags(df, col_overview.name, vocabulary)
+    if hasattr(col_overview, "top_10") and isinstance(col_overview.top_10, pd.Series):
+        col_overview.top_10_items = list(col_overview.top_10.items())
+    if col_overview.sequence == 'dna':
+        print(colored(f'Analyzing DNA/RNA sequences in column: {col_overview.name}', 'cyan'))
+        bio_data = dna_rna_columns(df[col_overview.name])
+        col_overview.dna_rna_data = bio_data
+    elif col_overview.sequence == 'protein':
+        print(colored(f'Analyzing protein sequences in column: {col_overview.name}', 'cyan'))
+        bio_data = protein_columns(df[col_overview.name])
+        col_overview.protein_data = bio_data
+    else:
+        col_overview.dna_rna_data = None
+        col_overview.protein_data = None
+
+    if col_overview.sequence == 'None':
+        measurement_data = measurement_columns(col_overview, df)
+        if measurement_data:
+            print(colored(f'Analyzing lab measurements in column: {col_overview.name}', 'cyan'))
+            col_overview.measurement_data = measurement_data
+        else:
+            col_overview.measurement_data = None
+    else:
+        col_overview.measurement_data = None
+    return col_overview
+
+
+@cli.command(context_settings=CONTEXT_SETTINGS)
+@click.pass_context
+def refresh(ctx: click.Context):
+    """Download the NCBI taxonomy dump and the COG/GO vocabularies again and rebuild the local cache."""
+    if ctx.parent.params['offline']:
+        raise click.UsageError("refresh needs network access and cannot be combined with --offline")
+    print(colored('Refreshing taxonomy cache …', 'green'))
+    get_taxonomy_index(refresh=True)
+    print(colored('Refreshing COG and GO vocabularies …', 'green'))
+    get_clusters_of_orthologous_groups(max_age=timedelta(0))
+    get_gene_ontology(max_age=timedelta(0))
+
+
+@cli.command(context_settings=CONTEXT_SETTINGS)
+@click.argument("profile", type=click.Path(exists=True, file_okay=False))
+@click.pass_context
+def render(ctx: click.Context, profile: str):
+    """Write the HTML report again from a profile stored with --profile-out, without reading the input data."""
+    print(colored(f'Reading profile {profile}', 'green'))
+    stored = read_profile(Path(profile))
+    write_report(stored.general, stored.duplicates_table, stored.plots, stored.columns, stored.numeric,
+                 stored.categorical, ctx.parent.params['split_columns'])
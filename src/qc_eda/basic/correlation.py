@@ -0,0 +1,215 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+METHODS = ('pearson', 'spearman', 'cramers_v')
+# Columns listed on a column card correlate at least this strongly with it
+CORRELATION_THRESHOLD = .3
+# Wider tables are correlated block by block without keeping the full matrix,
+# the column cards then list at most TOP_K correlated columns
+FULL_MATRIX_COLUMNS = 1000
+BLOCK_COLUMNS = 256
+TOP_K = 10
+# Columns shown in the heatmap of a table too wide for the full matrix
+HEATMAP_COLUMNS = 50
+# Cramér's V is only computed for columns with at least 2 and at most this many categories
+MAX_CATEGORIES = 100
+# Tables whose columns have at most this many categories together get all contingency tables of Cramér's V from
+# products of the one-hot encoded columns, with ONEHOT_CELLS cells encoded at once. Other tables count the
+# contingency table of every pair with a bincount, PAIR_BLOCK combined codes or table cells at once.
+DENSE_CATEGORIES = 2048
+ONEHOT_CELLS = 1 << 24
+PAIR_BLOCK = 1 << 22
+
+
+@dataclass
+class Correlations:
+    method: str
+    columns: list
+    # Full correlation matrix, None for tables with more than FULL_MATRIX_COLUMNS columns
+    matrix: np.ndarray | None
+    # Correlated columns with their coefficient, per column and in column order
+    related: dict = field(default_factory=dict)
+    # Columns and matrix of the heatmap, the strongest correlated columns for wide tables
+    heatmap: pd.DataFrame | None = None
+
+
+def correlation_columns(df: pd.DataFrame, method: str) -> list:
+    if method == 'cramers_v':
+        unique = df.nunique()
+        return [col for col in df.columns if 2 <= unique[col] <= MAX_CATEGORIES]
+    return list(df.select_dtypes(include='number').columns)
+
+
+def standardized(df: pd.DataFrame, columns: list, method: str) -> tuple[np.ndarray, np.ndarray | None]:
+    # Column values scaled to mean 0 and standard deviation 1, missing values as 0 and their mask separately.
+    # Spearman correlates the ranks, which are taken per column: rows missing in the other column of a pair
+    # do not change the ranks, unlike in pandas, which ranks every pair again.
+    values = df[columns]
+    if method == 'spearman':
+        values = values.rank()
+    values = values.to_numpy(dtype="float64", na_value=np.nan)
+    present = ~np.isnan(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = (values - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0)
+    values[~present] = 0.0
+    return values, None if present.all() else present.astype("float64")
+
+
+def pearson_block(z: np.ndarray, mask: np.ndarray | None, block: slice) -> np.ndarray:
+    # Correlations of the columns in block with all columns, from matrix products only
+    zb = z[:, block]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if mask is None:
+            # Without missing values every pair has all rows, the standardized values are multiplied directly
+            return np.clip(zb.T @ z / len(z), -1, 1)
+        # Pairwise complete: sums over the rows where both columns have a value
+        mb = mask[:, block]
+        n = mb.T @ mask
+        sum_x = zb.T @ mask
+        sum_y = mb.T @ z
+        sum_xx = (zb * zb).T @ mask
+        sum_yy = mb.T @ (z * z)
+        sum_xy = zb.T @ z
+        covariance = n * sum_xy - sum_x * sum_y
+        variance = (n * sum_xx - sum_x ** 2) * (n * sum_yy - sum_y ** 2)
+        r = covariance / np.sqrt(variance)
+        r[n < 2] = np.nan
+        return np.clip(r, -1, 1)
+
+
+def category_codes(df: pd.DataFrame, columns: list) -> tuple[np.ndarray, np.ndarray]:
+    # Codes of the categories, one row per column and -1 for missing values. MAX_CATEGORIES fits into int8.
+    codes = np.empty((len(columns), len(df)), dtype=np.int8)
+    for j, col in enumerate(columns):
+        codes[j] = pd.factorize(df[col])[0]
+    return codes, codes.max(axis=1).astype(np.int64) + 1
+
+
+def cramers_v_counts(counts: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    # Cramér's V of one column with several others from their contingency tables side by side, counts has a row
+    # per category of the column and the categories of the others as columns. Categories that do not occur in a
+    # pair are left out of its table.
+    starts = np.r_[0, np.cumsum(sizes)[:-1]]
+    table = np.repeat(np.arange(len(sizes)), sizes)
+    row_sums = np.add.reduceat(counts, starts, axis=1)
+    col_sums = counts.sum(axis=0)
+    n = row_sums.sum(axis=0)
+    k = np.minimum((row_sums > 0).sum(axis=0), np.bincount(table, weights=col_sums > 0, minlength=len(sizes))) - 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        terms = np.where(counts > 0, counts ** 2 / (row_sums[:, table] * col_sums), 0).sum(axis=0)
+        chi2 = n * (np.bincount(table, weights=terms, minlength=len(sizes)) - 1)
+        v = np.sqrt(chi2 / n / k)
+    v[(n == 0) | (k <= 0)] = np.nan
+    return np.minimum(v, 1.0)
+
+
+def cramers_v_pairs(ci: np.ndarray, ki: int, shifted: np.ndarray, sizes: np.ndarray,
+                    present: np.ndarray | None) -> np.ndarray:
+    # The contingency tables of one column with several others from one bincount over the combined codes,
+    # shifted holds the codes of the others already moved to their own columns. Missing values drop out of each pair.
+    width = sizes.sum()
+    keys = shifted + ci.astype(np.intp) * width
+    if present is not None or (ci < 0).any():
+        keys = keys[(ci >= 0) & (True if present is None else present)]
+    counts = np.bincount(keys.ravel(), minlength=ki * width).astype("float64")
+    return cramers_v_counts(counts.reshape(ki, width), sizes)
+
+
+def cramers_v_block(codes: np.ndarray, sizes: np.ndarray, block: slice, upper: bool = False) -> np.ndarray:
+    # Cramér's V of the columns in block with all columns, or only with the columns from their own on with upper.
+    # The other columns are taken in chunks bounded by PAIR_BLOCK combined codes and table cells, so memory does
+    # not depend on the total number of categories.
+    columns, n = codes.shape
+    rows = range(columns)[block]
+    result = np.full((len(rows), columns), np.nan)
+    missing = (codes < 0).any(axis=1)
+    step = max(1, PAIR_BLOCK // max(n, int(sizes.max()) ** 2))
+    for start in range(0, columns, step):
+        stop = min(start + step, columns)
+        shifted = codes[start:stop].astype(np.intp) + np.r_[0, np.cumsum(sizes[start:stop])[:-1]][:, None]
+        present = codes[start:stop] >= 0 if missing[start:stop].any() else None
+        for out, i in enumerate(rows):
+            if upper and stop <= i:
+                continue
+            result[out, start:stop] = cramers_v_pairs(codes[i], sizes[i], shifted, sizes[start:stop], present)
+    return result
+
+
+def cramers_v_dense(codes: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    # All contingency tables at once: the one-hot encoded columns multiplied with themselves give the
+    # counts of every pair of categories. Missing values have no category and drop out of each pair.
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    counts = np.zeros((offsets[-1], offsets[-1]))
+    rows = max(1, ONEHOT_CELLS // offsets[-1])
+    for start in range(0, codes.shape[1], rows):
+        block = codes[:, start:start + rows]
+        onehot = np.zeros((block.shape[1], offsets[-1]), dtype="float32")
+        for code, offset in zip(block, offsets):
+            present = np.flatnonzero(code >= 0)
+            onehot[present, offset + code[present]] = 1
+        counts += onehot.T @ onehot
+
+    matrix = np.full((len(sizes), len(sizes)), np.nan)
+    for i in range(len(sizes)):
+        matrix[i, i:] = cramers_v_counts(counts[offsets[i]:offsets[i + 1], offsets[i]:], sizes[i:])
+    return matrix
+
+
+def cramers_v(codes: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    # Full matrix, every pair is only counted once
+    if sizes.sum() <= DENSE_CATEGORIES:
+        matrix = cramers_v_dense(codes, sizes)
+    else:
+        matrix = cramers_v_block(codes, sizes, slice(None), upper=True)
+    lower = np.tril_indices_from(matrix, -1)
+    matrix[lower] = matrix.T[lower]
+    return matrix
+
+
+def related_columns(columns: list, row: np.ndarray, i: int, threshold: float, top_k: int | None) -> list | None:
+    strong = np.flatnonzero(row >= threshold)
+    strong = strong[strong != i]
+    if top_k is not None and strong.size > top_k:
+        strong = np.sort(strong[np.argsort(-row[strong], kind="stable")[:top_k]])
+    if not strong.size:
+        return None
+    return [(columns[j], float(row[j])) for j in strong]
+
+
+def correlation_block(data: tuple, method: str, block: slice, shown: np.ndarray | None = None) -> np.ndarray:
+    # Rows of the correlation matrix for the columns in block, among the shown columns only if given
+    if method == 'cramers_v':
+        codes, sizes = data if shown is None else (data[0][shown], data[1][shown])
+        return cramers_v_block(codes, sizes, block)
+    z, mask = data if shown is None else (data[0][:, shown], None if data[1] is None else data[1][:, shown])
+    return pearson_block(z, mask, block)
+
+
+def correlations(df: pd.DataFrame, method: str = 'pearson', threshold: float = CORRELATION_THRESHOLD,
+                 full_matrix_columns: int = FULL_MATRIX_COLUMNS, top_k: int = TOP_K) -> Correlations:
+    if method not in METHODS:
+        raise ValueError(f"Unknown correlation method {method}, expected one of {', '.join(METHODS)}")
+    columns = correlation_columns(df, method)
+    if not columns:
+        return Correlations(method=method, columns=[], matrix=None)
+    data = category_codes(df, columns) if method == 'cramers_v' else standardized(df, columns, method)
+    if len(columns) <= full_matrix_columns:
+        matrix = cramers_v(*data) if method == 'cramers_v' else pearson_block(*data, slice(None))
+        related = {col: related_columns(columns, matrix[i], i, threshold, None) for i, col in enumerate(columns)}
+        return Correlations(method, columns, matrix, related, pd.DataFrame(matrix, index=columns, columns=columns))
+
+    # Blocked mode: only BLOCK_COLUMNS rows of the matrix exist at a time and every column keeps its top_k partners
+    related = {}
+    strong_counts = np.zeros(len(columns), dtype=np.int64)
+    for start in range(0, len(columns), BLOCK_COLUMNS):
+        block = correlation_block(data, method, slice(start, start + BLOCK_COLUMNS))
+        for offset, row in enumerate(block):
+            i = start + offset
+            related[columns[i]] = related_columns(columns, row, i, threshold, top_k)
+            strong_counts[i] = np.count_nonzero(row >= threshold) - 1
+    shown = np.sort(np.argsort(-strong_counts, kind="stable")[:HEATMAP_COLUMNS])
+    names = [columns[i] for i in shown]
+    heatmap = correlation_block(data, method, slice(None), shown)
+    return Correlations(method, columns, None, related, pd.DataFrame(heatmap, index=names, columns=names))
@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Largest groups of identical rows shown as examples, and the most rows shown of them
+SAMPLE_GROUPS = 20
+SAMPLE_ROWS = 200
+# Odd 64 bit constant used to combine the column hashes of a row
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+@dataclass
+class Duplicates:
+    # Rows equal to an earlier row, as counted by DataFrame.duplicated()
+    duplicate_rows: int
+    # Groups of at least two equal rows, the rows in them and the size of the largest one
+    groups: int
+    rows_in_groups: int
+    largest_group: int
+    # Number of groups per group size
+    group_sizes: dict[int, int]
+    # Pairs of a column and the earlier column with the same content
+    duplicate_columns: list[tuple[str, str]]
+    # Rows of the largest groups with their original index
+    sample: pd.DataFrame
+    # Group number and group size of every sample row, kept apart so they never clash with the table's columns
+    sample_groups: np.ndarray
+    sample_group_sizes: np.ndarray
+
+
+def fold_weights(rows: int) -> np.ndarray:
+    # HASH_MULTIPLIER ** (rows - 1 - i) for every row i
+    powers = np.full(rows, HASH_MULTIPLIER, dtype=np.uint64)
+    if rows:
+        powers[0] = 1
+    with np.errstate(over="ignore"):
+        return np.cumprod(powers)[::-1]
+
+
+def fold_hashes(hashes: np.ndarray, weights: np.ndarray | None = None) -> int:
+    # Hash of a column in row order, so the hash of a column read in batches can be built batch by batch:
+    # fold_hashes(a + b) == combine_folds(fold_hashes(a), fold_hashes(b), len(b))
+    weights = fold_weights(len(hashes)) if weights is None else weights
+    with np.errstate(over="ignore"):
+        return int((hashes * weights).sum(dtype=np.uint64))
+
+
+def combine_folds(left: int, right: int, right_rows: int) -> int:
+    return (left * pow(int(HASH_MULTIPLIER), right_rows, 1 << 64) + right) % (1 << 64)
+
+
+def table_hashes(df: pd.DataFrame) -> tuple[np.ndarray, list[int]]:
+    # One 64 bit hash per row and one folded hash per column, only the cell hashes of one column are held at a time.
+    # Columns are taken by position so duplicated column names are kept apart.
+    rows = np.zeros(len(df), dtype=np.uint64)
+    weights = fold_weights(len(df))
+    folds = []
+    for i in range(df.shape[1]):
+        column = pd.util.hash_pandas_object(df.iloc[:, i], index=False).to_numpy()
+        with np.errstate(over="ignore"):
+            rows *= HASH_MULTIPLIER
+            rows += column
+        folds.append(fold_hashes(column, weights))
+    return rows, folds
+
+
+def duplicate_columns(df: pd.DataFrame, folds: list[int]) -> list[tuple[str, str]]:
+    # Columns with equal hashes are compared once more, so a hash collision never reports a duplicate
+    first: dict[int, list[int]] = {}
+    pairs = []
+    for i, fold in enumerate(folds):
+        candidates = first.setdefault(fold, [])
+        original = next((j for j in candidates if df.iloc[:, i].equals(df.iloc[:, j])), None)
+        if original is None:
+            candidates.append(i)
+        else:
+            pairs.append((df.columns[i], df.columns[original]))
+    return pairs
+
+
+def confirm_groups(df: pd.DataFrame, codes: np.ndarray) -> np.ndarray:
+    # Rows with equal hashes are compared with the first row of their group. Rows that differ from it only
+    # collided and are moved to a group of their own, until every group holds equal rows.
+    while True:
+        _, first = np.unique(codes, return_index=True)
+        rows = np.flatnonzero(first[codes] != np.arange(len(codes)))
+        differs = np.zeros(rows.size, dtype=bool)
+        for i in range(df.shape[1]):
+            column = df.iloc[:, i]
+            values = column.iloc[rows].reset_index(drop=True)
+            originals = column.iloc[first[codes[rows]]].reset_index(drop=True)
+            equal = values.eq(originals).fillna(False).to_numpy(dtype=bool)
+            differs |= ~(equal | (values.isna() & originals.isna()).to_numpy(dtype=bool))
+        if not differs.any():
+            return codes
+        moved = rows[differs]
+        codes = codes.copy()
+        codes[moved] += codes.max() + 1
+        codes = pd.factorize(codes)[0]
+
+
+def find_duplicates(df: pd.DataFrame, sample_groups: int = SAMPLE_GROUPS, sample_rows: int = SAMPLE_ROWS) -> Duplicates:
+    hashes, folds = table_hashes(df)
+    # Equal rows have equal hashes, rows are grouped by their hash and the groups are checked by their values
+    codes = confirm_groups(df, pd.factorize(hashes)[0])
+    sizes = np.bincount(codes)
+    repeated = np.flatnonzero(sizes > 1)
+    group_sizes = pd.Series(sizes[repeated]).value_counts().sort_index()
+
+    # Largest groups first, ties in the order the groups first appear
+    shown = repeated[np.argsort(-sizes[repeated], kind="stable")][:sample_groups]
+    group_number = np.full(sizes.size, -1)
+    group_number[shown] = np.arange(shown.size)
+    rows = np.flatnonzero(group_number[codes] >= 0)
+    rows = rows[np.argsort(group_number[codes[rows]], kind="stable")][:sample_rows]
+
+    return Duplicates(
+        duplicate_rows=int(len(df) - sizes.size),
+        groups=int(repeated.size),
+        rows_in_groups=int(sizes[repeated].sum()),
+        largest_group=int(sizes.max()) if repeated.size else 0,
+        group_sizes={int(size): int(count) for size, count in group_sizes.items()},
+        duplicate_columns=duplicate_columns(df, folds),
+        sample=df.iloc[rows],
+        sample_groups=group_number[codes[rows]] + 1,
+        sample_group_sizes=sizes[codes[rows]]
+    )
+
+
+def duplicates_table(duplicates: Duplicates) -> str:
+    # concat instead of insert, the table may already have columns called Group or index
+    bookkeeping = pd.DataFrame({"Group": duplicates.sample_groups, "Group size": duplicates.sample_group_sizes,
+                                "Row": duplicates.sample.index})
+    sample = pd.concat([bookkeeping, duplicates.sample.reset_index(drop=True)], axis=1)
+    return sample.to_html(classes="table table-hover table-responsive nowrap", border="0",
+                                     table_id="dup_table", index=False)
@@ -3,51 +3,63 @@ import pandas as pd
 import plotly.graph_objects as go
 from dataclasses import dataclass
 
+from .correlation import Correlations, correlations as compute_correlations
+from utils.plot_utils import box_statistics, figure_html, histogram_counts, missing_blocks, sample_rows
+
 @dataclass
 class GeneralPlots:
-    correlation_heatmap: str
-    missing_matrix: str
-    missing_values_barchart: str
-    balance_plot: str | None
-    boxplot: str
-    scatter_matrix: str
-
-def general_plots(df: pd.DataFrame, target: str) -> GeneralPlots:
+    correlation_heatmap: str | None = None
+    missing_matrix: str | None = None
+    missing_values_barchart: str | None = None
+    balance_plot: str | None = None
+    boxplot: str | None = None
+    scatter_matrix: str | None = None
+
+def general_plots(df: pd.DataFrame, target: str, correlations: Correlations | None = None) -> GeneralPlots:
     return GeneralPlots(
-        correlation_heatmap=correlation_heatmap(df),
+        correlation_heatmap=correlation_heatmap(correlations if correlations is not None else compute_correlations(df)),
         missing_matrix=missing_matrix(df),
-        missing_values_barchart=missing_values_barchart(df),
+        missing_values_barchart=missing_values_barchart(df.isna().sum()),
         balance_plot=balance_plot(df, target) if target else None,
         boxplot=boxplot(df),
-        scatter_matrix=scatter_matrix(df)
+        scatter_matrix=scatter_matrix(df, target)
     )
 
-def correlation_heatmap(df: pd.DataFrame):
-    corr_matrix = df.select_dtypes(include=['float64', 'int64']).corr()
-    corr_matrix = round(corr_matrix, 3)
+def correlation_heatmap(correlations: Correlations):
+    if correlations.heatmap is None:
+        return None
+    corr_matrix = round(correlations.heatmap, 3)
     fig = px.imshow(corr_matrix, text_auto=True, labels=dict(color="Correlation"), color_continuous_scale="RdBu_r", aspect="auto", height=700)
-    fig.update_layout(title="Correlation Heatmap")
-    return fig.to_html(full_html=False, include_plotlyjs='cdn')
+    title = {"pearson": "Correlation Heatmap", "spearman": "Spearman Correlation Heatmap",
+             "cramers_v": "Cramér's V Heatmap"}[correlations.method]
+    if correlations.matrix is None:
+        title += f" ({len(corr_matrix)} most correlated of {len(correlations.columns)} columns)"
+    fig.update_layout(title=title)
+    return figure_html(fig)
 
 
 def missing_matrix(df: pd.DataFrame):
-    missing_values = df.isnull().astype(int)
+    missing_values = missing_blocks(df)
+    title = "Missing Values Matrix"
+    if len(missing_values) < len(df):
+        title += f" (share of missing values in blocks of ~{len(df) // len(missing_values)} rows)"
 
     fig = px.imshow(
         missing_values,
         labels=dict(color="Missing Values"),
         aspect="auto",
         color_continuous_scale="blues_r",
-        title="Missing Values Matrix"
+        zmin=0,
+        zmax=1,
+        title=title
     )
     fig.update_yaxes(autorange='reversed')
-    fig.update_layout(coloraxis_showscale=False)
+    fig.update_layout(coloraxis_showscale=len(missing_values) < len(df))
 
 
-    return fig.to_html(full_html=False, include_plotlyjs='cdn')
+    return figure_html(fig)
 
-def missing_values_barchart(df: pd.DataFrame):
-    missing_counts = df.isna().sum()
+def missing_values_barchart(missing_counts: pd.Series):
     fig = px.bar(x=missing_counts.index, y=missing_counts.values, labels={'x': 'Columns', 'y': 'Missing Values'},color_discrete_sequence=['#0F65A0'])
     fig.update_layout(title="Missing Values per Column", bargap=0.2, plot_bgcolor='white')
     fig.update_xaxes(
@@ -66,10 +78,13 @@ def missing_values_barchart(df: pd.DataFrame):
         gridcolor='lightgrey'
     )
 
-    return fig.to_html(full_html=False, include_plotlyjs='cdn')
+    return figure_html(fig)
 
 def balance_plot(df, target):
-    fig = px.histogram(df, x=target, color_discrete_sequence=["#0F65A0"], text_auto=True)
+    x, counts, widths = histogram_counts(df[target], df[target].nunique())
+    fig = px.bar(x=x, y=counts, labels={'x': target, 'y': 'count'}, color_discrete_sequence=["#0F65A0"], text_auto=True)
+    if widths is not None:
+        fig.update_traces(width=widths)
     fig.update_layout(
         title="Class Balance (Target Distribution)",
         bargap=0.2,
@@ -89,14 +104,26 @@ def balance_plot(df, target):
         linecolor="black",
         gridcolor="lightgrey"
     )
-    return fig.to_html(full_html=False, include_plotlyjs='cdn')
+    return figure_html(fig)
 
 def boxplot(df: pd.DataFrame):
     df = df.select_dtypes(include=['float64', 'int64'])
     fig = go.Figure()
-
-    for col in df:
-        fig.add_trace(go.Box(y=df[col].values, name=df[col].name))
+    colors = px.colors.qualitative.Plotly
+
+    # Box statistics are computed here, so the figure only holds a few numbers and an outlier sample per column
+    for i, col in enumerate(df):
+        stats = box_statistics(df[col])
+        if stats is None:
+            continue
+        color = colors[i % len(colors)]
+        fig.add_trace(go.Box(x=[stats.name], q1=[stats.q1], median=[stats.median], q3=[stats.q3],
+                             lowerfence=[stats.lower_fence], upperfence=[stats.upper_fence], mean=[stats.mean],
+                             name=stats.name, legendgroup=stats.name, marker_color=color))
+        if stats.outliers.size:
+            fig.add_trace(go.Scatter(x=[stats.name] * stats.outliers.size, y=stats.outliers, mode="markers",
+                                     name=f"{stats.name} outliers ({stats.n_outliers})", legendgroup=stats.name,
+                                     showlegend=False, marker=dict(color=color, size=4)))
     fig.update_yaxes(type="log", title="Logarithmic",showticklabels=False)
     fig.update_layout(
         title="Boxplot",
@@ -105,10 +132,13 @@ def boxplot(df: pd.DataFrame):
         legend_title="Columns"
     )
 
-    return fig.to_html(full_html=False, include_plotlyjs='cdn')
+    return figure_html(fig)
 
-def scatter_matrix(df: pd.DataFrame):
-    df = df.select_dtypes(include=['float64', 'int64'])
+def scatter_matrix(df: pd.DataFrame, target: str | None = None):
+    rows = len(df)
+    # Stratify the sample by a categorical target, so that rare classes keep their points
+    stratify = target if target and not pd.api.types.is_float_dtype(df[target]) else None
+    df = sample_rows(df, by=stratify).select_dtypes(include=['float64', 'int64'])
     fig = px.scatter_matrix(df, color_discrete_sequence=["#0F65A0"], height=750)
 
     fig.update_traces(
@@ -118,7 +148,7 @@ def scatter_matrix(df: pd.DataFrame):
 
     # Layout anpassen
     fig.update_layout(
-        title="Scatter Matrix",
+        title="Scatter Matrix" if len(df) == rows else f"Scatter Matrix (sample of {len(df)} of {rows} rows)",
         xaxis_title="Columns",
         plot_bgcolor="white",
         bargap=0.2,
@@ -153,4 +183,4 @@ def scatter_matrix(df: pd.DataFrame):
         y=-0.08 if a.textangle == 0 and 'x' in str(a.xref) else a.y
     ))
 
-    return fig.to_html(full_html=False, include_plotlyjs='cdn')
+    return figure_html(fig)
@@ -2,7 +2,65 @@ import re
 from enum import Enum
 
 class MEASUREMENTS(Enum):
-    UNIT_IN_COL_TITLE = re.compile(r'\[[a-zA-Zµμ°/]+]', re.I)
-    UNIT_PREFIXES = r'(Q|R|Y|Z|E|P|T|G|M|k|h|da|d|c|m|µ|μ|micro|n|p|f|a|z|y|r|q)'
-    UNITS = r'(g|mol|M|m|L|l|s|min|unit|units|°C|C|K|A|cd|h|24 h|d|g creatinine|Eq|%|U|kU|IU|L (%)|% of total Hb|Fraction of total Hb|Osm|AU|angstroms|\d)'
-    UNIT_COLUMN = re.compile(rf'^((\d\.,)+\s*)?{UNIT_PREFIXES}?{UNITS}(/{UNIT_PREFIXES}?{UNITS})*$', re.I)
+    UNIT_IN_COL_TITLE = re.compile(r'\[([^\[\]]+)]')
+    # Optional number, then the unit: '2.5 mg/L', '10%', '-3e-2 M', 'mg' or '1,5 µl'
+    VALUE_AND_UNIT = re.compile(r'^\s*(?P<value>[-+]?(?:\d+(?:[.,]\d*)?|[.,]\d+)(?:[eE][-+]?\d+)?)?\s*(?P<unit>[^\d\s].*?)?\s*$')
+
+
+# Factor of every SI prefix, micro also written as u
+PREFIXES = {
+    'Q': 1e30, 'R': 1e27, 'Y': 1e24, 'Z': 1e21, 'E': 1e18, 'P': 1e15, 'T': 1e12, 'G': 1e9, 'M': 1e6, 'k': 1e3,
+    'h': 1e2, 'da': 1e1, 'd': 1e-1, 'c': 1e-2, 'm': 1e-3, 'µ': 1e-6, 'μ': 1e-6, 'u': 1e-6, 'n': 1e-9, 'p': 1e-12,
+    'f': 1e-15, 'a': 1e-18, 'z': 1e-21, 'y': 1e-24, 'r': 1e-27, 'q': 1e-30,
+}
+
+# Unit: (SI unit, factor to the SI unit, takes prefixes). Units without an SI unit are kept as they are.
+UNITS = {
+    'g': ('kg', 1e-3, True),
+    'mol': ('mol', 1.0, True),
+    'M': ('mol/m³', 1e3, True),
+    'm': ('m', 1.0, True),
+    'Å': ('m', 1e-10, False),
+    'angstrom': ('m', 1e-10, False),
+    'angstroms': ('m', 1e-10, False),
+    'L': ('m³', 1e-3, True),
+    'l': ('m³', 1e-3, True),
+    's': ('s', 1.0, True),
+    'min': ('s', 60.0, False),
+    'h': ('s', 3600.0, False),
+    'd': ('s', 86400.0, False),
+    '24 h': ('s', 86400.0, False),
+    'K': ('K', 1.0, True),
+    '°C': ('K', 1.0, False),
+    'A': ('A', 1.0, True),
+    'cd': ('cd', 1.0, True),
+    'Eq': ('Eq', 1.0, True),
+    'Osm': ('Osm', 1.0, True),
+    'U': ('U', 1.0, True),
+    'unit': ('U', 1.0, False),
+    'units': ('U', 1.0, False),
+    'IU': ('IU', 1.0, False),
+    'AU': ('AU', 1.0, False),
+    '%': ('%', 1.0, False),
+    'g creatinine': ('kg creatinine', 1e-3, True),
+    '% of total Hb': ('% of total Hb', 1.0, False),
+    'Fraction of total Hb': ('Fraction of total Hb', 1.0, False),
+}
+# Celsius is the only unit with an offset to its SI unit
+OFFSETS = {'°C': 273.15}
+
+
+def unit_table() -> dict[str, tuple[str, float]]:
+    # Every unit with every prefix it takes, looked up in one step. Plain units are added last,
+    # so 'min', 'cd' or 'h' are minute, candela and hour, not prefixed units.
+    table = {}
+    for unit, (si_unit, factor, prefixed) in UNITS.items():
+        if prefixed:
+            for prefix, prefix_factor in PREFIXES.items():
+                table[prefix + unit] = (si_unit, factor * prefix_factor)
+    for unit, (si_unit, factor, _) in UNITS.items():
+        table[unit] = (si_unit, factor)
+    return table
+
+
+UNIT_TABLE = unit_table()
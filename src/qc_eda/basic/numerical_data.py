@@ -1,14 +1,28 @@
+import math
 from dataclasses import dataclass
 
 import numpy as np
 import pandas as pd
 import plotly.express as px
+import pyarrow as pa
 from numpy import ndarray
 from pandas.api.types import infer_dtype
-from scipy import stats
 
-from .sequence_enum import Sequence
-from .wrapper_utils import fast_check_sequence
+from .duplicates import Duplicates, find_duplicates
+from .sequence_enum import Sequence, RESIDUE_TABLE
+from .sketches import HyperLogLog
+from .statistics import categorical_summary, numeric_summary, sketch_summary
+from .wrapper_utils import residue_mask
+from utils.plot_utils import figure_html, histogram_counts
+
+# Columns longer than the sample size are classified from a random sample. If every sampled row matches,
+# at most SEQUENCE_TOLERANCE of all rows do not match with probability SEQUENCE_CONFIDENCE.
+SEQUENCE_CONFIDENCE = 0.99
+SEQUENCE_TOLERANCE = 1e-4
+# Type names of text columns, string[pyarrow] columns from utils.file_reader are reported as 'string'
+TEXT_TYPES = ('object', 'string')
+# Values of a column that infer_type looks at
+TYPE_SAMPLE_SIZE = 10_000
 
 """
 ToDo Numerical data:
@@ -33,6 +47,8 @@ class NumericalData:
     dup_col: int
     memory: float
     alerts: int
+    dup_groups: int | None = None
+    dup_largest: int | None = None
 
 
 @dataclass
@@ -48,6 +64,9 @@ class ColumnOverview:
     constant: bool
     correlation: list[str] | None
     # taxonomy: bool
+    unique_error: float | None = None
+    # Share of rows that may not match the sequence type when it was classified from a sample
+    sequence_error: float | None = None
 
 
 @dataclass
@@ -69,6 +88,9 @@ class NumericColumns:
     memory: int
     value_counts: dict
     frequencies: dict
+    quantile_error: float | None = None
+    # Largest count missing from the value counts when the mode and value counts are approximate
+    count_error: int | None = None
 
     # cardinalities: list[int]
 
@@ -87,102 +109,127 @@ class CategoricalColumns:
     min_category_length: int
     memory: int
     cardinality_ratio: float
+    unique_error: float | None = None
 
 
-def overview(df: pd.DataFrame, file) -> NumericalData:
+def overview(df: pd.DataFrame, file, duplicates: Duplicates | None = None) -> NumericalData:
+    duplicates = find_duplicates(df) if duplicates is None else duplicates
     return NumericalData(
         filename=file,
         rows=df.shape[0],
         cols=df.shape[1],
         nulls=sum(df.isnull().sum()),
         nulls_percentage=round(sum(df.isnull().sum()) * 100 / df.size, 2),
-        dup_row=int(df.duplicated().sum()),
-        dup_col=int(df.columns.duplicated().sum()),
+        dup_row=duplicates.duplicate_rows,
+        dup_col=len(duplicates.duplicate_columns),
         memory=int(df.memory_usage(deep=True).sum()),
-        alerts=0
+        alerts=0,
+        dup_groups=duplicates.groups,
+        dup_largest=duplicates.largest_group
     )
 
 
-def column_overview(df: pd.DataFrame, col) -> ColumnOverview:
+def column_overview(df: pd.DataFrame, col, approx: bool = False, sequence: str | None = None,
+                    sequence_error: float | None = None) -> ColumnOverview:
+    series = df[col]
+    missing = int(series.isnull().sum())
+    unique, unique_error = count_unique(series, approx)
+    if sequence is None:
+        sequence, sequence_error = sequence_type(series)
     return ColumnOverview(
         name=col,
-        number=int(df[col].notnull().sum()),
-        unique=df[col].nunique(),
-        missing=int(df[col].isnull().sum()),
-        missing_per=round(float(df[col].isnull().sum() * 100 / df[col].size), 2),
-        type=str(df[col].dtype),
-        sequence=check_sequence(df, col),
-        describe_plot=plot_overview(df[col]),
-        constant=True if (df[col].nunique() == 1) else False,
-        correlation=get_correlation(df, col),
+        number=int(series.size - missing),
+        unique=unique,
+        missing=missing,
+        missing_per=round(float(missing * 100 / series.size), 2),
+        type=str(series.dtype),
+        sequence=sequence,
+        describe_plot=plot_overview(series, unique),
+        constant=True if (unique == 1) else False,
+        # Filled in from qc_eda.basic.correlation, which correlates all columns at once
+        correlation=None,
+        unique_error=unique_error,
+        sequence_error=sequence_error
     )
 
 
-def numeric_columns(df: pd.DataFrame, col) -> NumericColumns:
+def count_unique(series: pd.Series, approx: bool = False) -> tuple[int, float | None]:
+    if approx:
+        sketch = HyperLogLog().update(series)
+        return sketch.estimate(), sketch.error
+    return series.nunique(), None
+
+
+def numeric_columns(df: pd.DataFrame, col, approx: bool = False) -> NumericColumns:
+    values = df[col].dropna().to_numpy()
+    if values.dtype == object:
+        values = values.astype("float64")
+    summary = sketch_summary(values) if approx else numeric_summary(values)
+    m = summary.moments
+    value_counts = summary.most_common(20)
+
     return NumericColumns(
         name=col,
-        min=round(df[col].min(), 2),
-        max=round(df[col].max(), 2),
-        mean=round(df[col].mean(), 2),
-        median=round(df[col].median(), 2),
-        mode=round(df[col].mode().iloc[0], 2),
-        std=round(df[col].std(), 2),
-        sum=round(df[col].sum(), 2),
-        kurtosis=round(df[col].kurtosis(), 2),
-        skewness=round(df[col].skew(), 2),
-        mad=stats.median_abs_deviation(df[col], nan_policy='omit'),  # Ignore NaN values, set Warning
-        coefficient_of_variation=round(stats.variation(df[col], nan_policy='omit'), 2),
-        quantiles=stats.quantile(df[col], [0.25, 0.5, 0.75]),
+        min=round(m.min, 2),
+        max=round(m.max, 2),
+        mean=round(m.mean, 2),
+        median=round(summary.median, 2),
+        mode=round(summary.mode, 2),
+        std=round(m.std, 2),
+        sum=round(m.sum, 2),
+        kurtosis=round(m.kurtosis, 2),
+        skewness=round(m.skewness, 2),
+        mad=summary.mad,
+        coefficient_of_variation=round(m.variation, 2),
+        quantiles=summary.quantiles,
         memory=df[col].memory_usage(deep=True),
-        value_counts=df[col].value_counts().head(20).to_dict(),
-        frequencies=df[col].value_counts(normalize=True).head(20).to_dict()
-
+        value_counts=value_counts.to_dict(),
+        frequencies=(value_counts / m.count).to_dict(),
+        quantile_error=summary.error,
+        count_error=summary.count_error or None
     )
 
 
-def categorical_columns(df: pd.DataFrame, col: str) -> CategoricalColumns:
-    value_counts = df[col].value_counts()
-    n = len(df[col])
-    frequencies = value_counts / n
+def categorical_columns(df: pd.DataFrame, col: str, approx: bool = False) -> CategoricalColumns:
+    summary = categorical_summary(df[col])
+    n = summary.rows
+    frequencies = summary.counts / n
 
     entropy = -(frequencies * np.log2(frequencies)).sum()
     gini = 1 - (frequencies ** 2).sum()
     simpson = 1 / (frequencies ** 2).sum()
-    lengths = df[col].astype(str).str.len()
+    lengths = summary.lengths()
+    value_counts = summary.most_common(20)
+    if approx:
+        unique, unique_error = count_unique(df[col], approx)
+    else:
+        unique, unique_error = len(summary.uniques), None
 
     return CategoricalColumns(
         name=col,
-        unique_categories=df[col].nunique(),
-        mode=df[col].mode().iloc[0],
+        unique_categories=unique,
+        mode=summary.mode,
         entropy=round(entropy, 2),
-        frequencies=df[col].value_counts(normalize=True).head(20).to_dict(),
+        frequencies=(value_counts / summary.counts.sum()).to_dict(),
         gini=round(gini, 2),
         simpson_diversity=round(simpson, 2),
-        value_counts=df[col].value_counts().head(20).to_dict(),
-        max_category_length=lengths.max(),
-        min_category_length=lengths.min(),
+        value_counts=value_counts.to_dict(),
+        max_category_length=lengths.max() if lengths.size else None,
+        min_category_length=lengths.min() if lengths.size else None,
         memory=df[col].memory_usage(deep=True),
-        cardinality_ratio=round(df[col].nunique() / n, 3)
+        cardinality_ratio=round(unique / n, 3),
+        unique_error=unique_error
     )
 
 
-def get_correlation(df: pd.DataFrame, col) -> list | None:
-    ncols = df.select_dtypes(include='number').columns
-    if col in ncols:
-        corr = df[ncols].corrwith(df[col], method='pearson')
-        corr.drop(labels=col, inplace=True)
-        corr = corr.drop(corr[corr < .3].index)
-        if corr.empty:
-            return None
-        return list(zip(corr.index, corr))
-    return None
-
-
 # ToDo: move to plot_utils
-def plot_overview(col):
-    if col.dtype != 'object':
-        bins = None if col.nunique() < 10 else 10
-        fig = px.histogram(col, nbins=bins, color_discrete_sequence=['#0F65A0'])
+def plot_overview(col, unique: int | None = None):
+    if not is_text(col):
+        unique = col.nunique() if unique is None else unique
+        x, counts, widths = histogram_counts(col, unique)
+        fig = px.bar(x=x, y=counts, labels={'x': col.name, 'y': 'count'}, color_discrete_sequence=['#0F65A0'])
+        if widths is not None:
+            fig.update_traces(width=widths)
         fig.update_layout(bargap=0.2, plot_bgcolor='white')
         fig.update_xaxes(
             mirror=True,
@@ -198,25 +245,69 @@ def plot_overview(col):
             linecolor='black',
             gridcolor='lightgrey'
         )
-        return fig.to_html(full_html=False, include_plotlyjs='cdn')
+        return figure_html(fig)
     return None
 
 
+def is_text(series: pd.Series) -> bool:
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+
 # ToDo: move to sequence_utils
 def check_sequence(df, col):
-    if df[col].name in df.select_dtypes(include=['number', 'bool']).columns or infer_dtype(df[col]).__contains__('mixed'):
-        return "None"
-    if df[col].astype(str).str.len().eq(1).all():
-        return "None"
-    values = df[col].dropna().astype(str).tolist()
-    if all(len(x) > 1 for x in values):
-        if fast_check_sequence(values, Sequence.DNA.value):
-            return "dna"
-        elif fast_check_sequence(values, Sequence.RNA.value):
-            return "rna"
-        elif fast_check_sequence(values, Sequence.PROTEIN.value):
-            return "protein"
-    return "None"
+    return sequence_type(df[col])[0]
+
+
+def infer_type(values: pd.Series) -> str:
+    # infer_dtype scans every value of object columns, a random sample of the non-missing values is enough to tell
+    if len(values) > TYPE_SAMPLE_SIZE:
+        values = values.sample(TYPE_SAMPLE_SIZE, random_state=0)
+    return infer_dtype(values, skipna=True)
+
+
+def sequence_type(series: pd.Series, inferred: str | None = None) -> tuple[str, float | None]:
+    # The sequence type and the bound from classify_alphabet, which is None when every row was checked
+    if pd.api.types.is_numeric_dtype(series):
+        return "None", None
+    values = series.dropna()
+    inferred = infer_type(values) if inferred is None else inferred
+    if 'mixed' in inferred:
+        return "None", None
+    try:
+        return classify_alphabet(values, inferred == 'string')
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # The sample only had strings, but the rest of the column does not
+        return classify_alphabet(values, False)
+
+
+def sequence_sample_size(confidence: float = SEQUENCE_CONFIDENCE, tolerance: float = SEQUENCE_TOLERANCE) -> int:
+    return math.ceil(math.log(1 - confidence) / math.log(1 - tolerance))
+
+
+def classify_alphabet(values: pd.Series, is_string: bool = False, confidence: float = SEQUENCE_CONFIDENCE,
+                      tolerance: float = SEQUENCE_TOLERANCE) -> tuple[str, float | None]:
+    # Returns the sequence type and the bound on non-matching rows, which is None when every row was checked
+    sample_size = sequence_sample_size(confidence, tolerance)
+    bound = None
+    if len(values) > sample_size:
+        values = values.sample(sample_size, random_state=0)
+        bound = tolerance
+    if not is_string:
+        values = values.astype(str)
+    array = pa.array(values, type=pa.large_string(), from_pandas=True)
+    if len(array) == 0:
+        return "None", None
+
+    _, offsets, data = array.buffers()
+    offsets = np.frombuffer(offsets, dtype=np.int64)[array.offset:array.offset + len(array) + 1]
+    if (np.diff(offsets) <= 1).any():
+        return "None", None
+    mask = residue_mask(np.frombuffer(data, dtype=np.uint8)[offsets[0]:offsets[-1]], RESIDUE_TABLE)
+    # The lowest set bit wins, so a column matching several alphabets is reported as DNA before RNA before protein
+    for sequence in Sequence:
+        if mask & sequence:
+            return sequence.name.lower(), bound
+    return "None", None
 
 
 """def rank_taxonomy(df, col):
@@ -0,0 +1,132 @@
+import hashlib
+from collections import Counter
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from .numerical_data import infer_type, is_text, sequence_type
+
+# dtypes whose columns also get the categorical statistics, next to text, boolean and category columns
+CATEGORICAL_NUMBER_TYPES = ('int64', 'float64')
+
+
+@dataclass
+class ColumnSchema:
+    name: str
+    dtype: str
+    # numeric, boolean, text, category, datetime or other
+    kind: str
+    # infer_dtype of a sample of the values
+    inferred: str
+    sequence: str
+    # Share of rows that may not match the sequence type when it was classified from a sample
+    sequence_error: float | None = None
+    # What the analyzers found the column to be, e.g. measurement, taxon_name or go
+    semantic: set = field(default_factory=set)
+
+    @property
+    def numeric(self) -> bool:
+        return self.kind == 'numeric'
+
+    @property
+    def text(self) -> bool:
+        return self.kind == 'text'
+
+    @property
+    def categorical(self) -> bool:
+        return self.sequence == 'None' and (self.kind in ('text', 'boolean', 'category')
+                                            or self.dtype in CATEGORICAL_NUMBER_TYPES)
+
+    @property
+    def taxonomy_candidate(self) -> bool:
+        # Tax IDs are numbers and taxon names are text, sequences are neither
+        return self.sequence == 'None' and self.kind in ('numeric', 'text')
+
+    @property
+    def annotation_candidate(self) -> bool:
+        return self.sequence == 'None' and self.kind == 'text'
+
+
+def column_kind(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series):
+        return 'boolean'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numeric'
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return 'category'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    if is_text(series):
+        return 'text'
+    return 'other'
+
+
+def column_schema(series: pd.Series) -> ColumnSchema:
+    kind = column_kind(series)
+    inferred = infer_type(series.dropna()) if kind == 'text' else str(series.dtype)
+    sequence, sequence_error = sequence_type(series, inferred) if kind == 'text' else ("None", None)
+    return ColumnSchema(
+        name=series.name,
+        dtype=str(series.dtype),
+        kind=kind,
+        inferred=inferred,
+        sequence=sequence,
+        sequence_error=sequence_error
+    )
+
+
+class Schema:
+    # Types of all columns, inferred once per table and read by every analyzer
+    def __init__(self, columns: list[ColumnSchema]):
+        self.columns = {column.name: column for column in columns}
+
+    def __getitem__(self, name) -> ColumnSchema:
+        return self.columns[name]
+
+    def __iter__(self):
+        return iter(self.columns.values())
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def digest(self) -> str:
+        # Part of the keys of cached column results. Covers the inferred types of every column, but not the
+        # semantic types the analyzers add while the results are computed.
+        digest = hashlib.blake2b(digest_size=16)
+        for column in self:
+            digest.update(repr((column.name, column.dtype, column.kind, column.inferred, column.sequence,
+                                column.sequence_error)).encode("utf-8"))
+        return digest.hexdigest()
+
+    @property
+    def numeric(self) -> list:
+        return [column.name for column in self if column.numeric]
+
+    @property
+    def categorical(self) -> list:
+        return [column.name for column in self if column.categorical]
+
+    def record(self, col_overview, annotation_type: str | None = None):
+        # Adds what the analyzers found about a column to its semantic types
+        semantic = self[col_overview.name].semantic
+        if col_overview.sequence != 'None':
+            semantic.add(col_overview.sequence)
+        if self[col_overview.name].numeric:
+            semantic.add('numeric')
+        if self[col_overview.name].categorical:
+            semantic.add('categorical')
+        if getattr(col_overview, 'measurement_data', None):
+            semantic.add('measurement')
+        taxonomy = getattr(col_overview, 'taxonomy', None)
+        if taxonomy is not None and taxonomy.is_taxonomy:
+            semantic.add('taxonomy_id' if taxonomy.taxid is not None else 'taxon_name')
+        annotation = getattr(col_overview, 'annotation', None)
+        if annotation is not None and annotation.is_annotation and annotation_type:
+            semantic.add(annotation_type)
+
+    def summary(self) -> Counter:
+        return Counter(tag for column in self for tag in column.semantic)
+
+
+def infer_schema(df: pd.DataFrame) -> Schema:
+    return Schema([column_schema(df[col]) for col in df.columns])
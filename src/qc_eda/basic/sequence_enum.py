@@ -1,7 +1,29 @@
-import re
-from enum import Enum
+from enum import IntFlag
 
-class Sequence(Enum):
-    DNA = re.compile('^[acgtn]*$', re.I)
-    RNA = re.compile('^[acgun]*$', re.I)
-    PROTEIN = re.compile('^[acdefghiklmnpqrstvwyxju]*$', re.I)
\ No newline at end of file
+import numpy as np
+
+
+class Sequence(IntFlag):
+    DNA = 1
+    RNA = 2
+    PROTEIN = 4
+
+
+ALPHABETS = {
+    Sequence.DNA: 'acgtn',
+    Sequence.RNA: 'acgun',
+    Sequence.PROTEIN: 'acdefghiklmnpqrstvwyxju',
+}
+
+
+def residue_table() -> np.ndarray:
+    # Bitmask of every sequence type a byte may occur in, bytes outside all alphabets map to 0
+    table = np.zeros(256, dtype=np.uint8)
+    for sequence, letters in ALPHABETS.items():
+        for letter in letters:
+            table[ord(letter)] |= sequence
+            table[ord(letter.upper())] |= sequence
+    return table
+
+
+RESIDUE_TABLE = residue_table()
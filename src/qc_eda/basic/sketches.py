@@ -0,0 +1,133 @@
+import math
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+
+def _leading_zeros(values: np.ndarray) -> np.ndarray:
+    # Smear the highest set bit to the right, the popcount is then the bit length
+    smeared = values.copy()
+    for shift in (1, 2, 4, 8, 16, 32):
+        smeared |= smeared >> np.uint64(shift)
+    return 64 - np.bitwise_count(smeared).astype(np.int64)
+
+
+@dataclass
+class HyperLogLog:
+    precision: int = 14
+    registers: np.ndarray = None
+
+    def __post_init__(self):
+        if self.registers is None:
+            self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+
+    def update(self, values) -> "HyperLogLog":
+        values = pd.Series(values).dropna()
+        if values.empty:
+            return self
+        hashes = pd.util.hash_array(values.to_numpy())
+        p = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+        # The sentinel bit caps the rank when all remaining bits are zero
+        rest = (hashes << p) | (np.uint64(1) << (p - np.uint64(1)))
+        rank = _leading_zeros(rest) + 1
+        # Mark every (register, rank) pair that occurs, then take the highest rank per register
+        seen = np.bincount(index * 66 + rank, minlength=self.registers.size * 66).reshape(-1, 66) > 0
+        highest = 65 - np.argmax(seen[:, ::-1], axis=1)
+        np.maximum(self.registers, np.where(seen.any(axis=1), highest, 0).astype(np.uint8), out=self.registers)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+
+    def estimate(self) -> int:
+        m = self.registers.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int((self.registers == 0).sum())
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+    # Relative standard error of the estimate
+    @property
+    def error(self) -> float:
+        return 1.04 / math.sqrt(self.registers.size)
+
+
+# Seeds of sketches created without one. Every sketch flips its own coins, sketches of many batches that all
+# started from the same seed would compact alike and their errors would add up instead of averaging out.
+_SEEDS = np.random.default_rng(0)
+
+
+@dataclass
+class KLLSketch:
+    k: int = 200
+    levels: list = field(default_factory=list)
+    seed: int | None = None
+
+    def __post_init__(self):
+        if self.seed is None:
+            self.seed = int(_SEEDS.integers(1 << 63))
+        self._rng = np.random.default_rng(self.seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(8, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values: np.ndarray) -> "KLLSketch":
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if values.size:
+            if not self.levels:
+                self.levels.append(values)
+            else:
+                self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        merged = KLLSketch(self.k, seed=int(self._rng.integers(1 << 63)))
+        for level in range(max(len(self.levels), len(other.levels))):
+            parts = [s.levels[level] for s in (self, other) if level < len(s.levels)]
+            merged.levels.append(np.concatenate(parts))
+        merged._compress()
+        return merged
+
+    # Sort an overfull level and promote every second item with doubled weight to the next level
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if items.size > self._capacity(level):
+                items = np.sort(items)
+                keep = items[:1] if items.size % 2 else items[:0]
+                promoted = items[keep.size + self._rng.integers(2)::2]
+                self.levels[level] = keep
+                if level + 1 == len(self.levels):
+                    self.levels.append(promoted)
+                else:
+                    self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    @property
+    def count(self) -> int:
+        return int(sum(items.size << level for level, items in enumerate(self.levels)))
+
+    def quantiles(self, probs) -> np.ndarray:
+        probs = np.asarray(probs, dtype="float64")
+        if not self.levels or self.count == 0:
+            return np.full(probs.shape, math.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level_items.size, 1 << level, dtype=np.int64)
+                                  for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items, cumulative = items[order], np.cumsum(weights[order])
+        ranks = np.searchsorted(cumulative, probs * cumulative[-1], side="left")
+        return items[np.minimum(ranks, items.size - 1)]
+
+    # Normalized rank error with 99 % confidence, empirical fit published with the Apache DataSketches KLL sketch
+    @property
+    def error(self) -> float:
+        return 2.296 / self.k ** 0.9723
@@ -0,0 +1,262 @@
+import math
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .sketches import KLLSketch
+
+# Values the approximate summary converts and sketches at once, it never holds more than one chunk besides the sketches
+SKETCH_CHUNK = 1 << 18
+
+
+@dataclass
+class Moments:
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    m3: float = 0.0
+    m4: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+    sum: float = 0.0
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> "Moments":
+        if values.size == 0:
+            return cls()
+        mean = values.mean()
+        dev = values - mean
+        dev2 = dev * dev
+        return cls(
+            count=int(values.size),
+            mean=float(mean),
+            m2=float(dev2.sum()),
+            m3=float((dev2 * dev).sum()),
+            m4=float((dev2 * dev2).sum()),
+            min=float(values.min()),
+            max=float(values.max()),
+            sum=float(values.sum())
+        )
+
+    # Pairwise update of the central moments (Pébay 2008), so partial results can be merged in any order
+    def merge(self, other: "Moments") -> "Moments":
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            return other
+        na, nb = self.count, other.count
+        n = na + nb
+        delta = other.mean - self.mean
+        delta_n = delta / n
+        m2 = self.m2 + other.m2 + delta * delta_n * na * nb
+        m3 = (self.m3 + other.m3 + delta * delta_n ** 2 * na * nb * (na - nb)
+              + 3 * delta_n * (na * other.m2 - nb * self.m2))
+        m4 = (self.m4 + other.m4 + delta * delta_n ** 3 * na * nb * (na * na - na * nb + nb * nb)
+              + 6 * delta_n ** 2 * (na * na * other.m2 + nb * nb * self.m2)
+              + 4 * delta_n * (na * other.m3 - nb * self.m3))
+        return Moments(
+            count=n,
+            mean=self.mean + nb * delta_n,
+            m2=m2,
+            m3=m3,
+            m4=m4,
+            min=min(self.min, other.min),
+            max=max(self.max, other.max),
+            sum=self.sum + other.sum
+        )
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    # Bias corrected skewness and excess kurtosis, as returned by pandas
+    @property
+    def skewness(self) -> float:
+        n = self.count
+        if n < 3 or self.m2 == 0:
+            return 0.0 if n >= 3 else math.nan
+        g1 = (self.m3 / n) / (self.m2 / n) ** 1.5
+        return math.sqrt(n * (n - 1)) / (n - 2) * g1
+
+    @property
+    def kurtosis(self) -> float:
+        n = self.count
+        if n < 4 or self.m2 == 0:
+            return 0.0 if n >= 4 else math.nan
+        g2 = (self.m4 / n) / (self.m2 / n) ** 2 - 3
+        return ((n + 1) * g2 + 6) * (n - 1) / ((n - 2) * (n - 3))
+
+    # Population standard deviation over the mean, as returned by scipy.stats.variation
+    @property
+    def variation(self) -> float:
+        if self.count == 0 or self.mean == 0:
+            return math.nan
+        return math.sqrt(self.m2 / self.count) / self.mean
+
+
+@dataclass
+class TopK:
+    capacity: int = 1000
+    counts: pd.Series = field(default_factory=lambda: pd.Series(dtype="int64"))
+    # Largest count dropped while trimming, zero means the kept counts are exact
+    error: int = 0
+
+    @classmethod
+    def from_counts(cls, capacity: int, uniques: np.ndarray, counts: np.ndarray) -> "TopK":
+        # Trimmed with NumPy before the Series is built, for chunks with many more distinct values than capacity
+        if counts.size <= capacity:
+            return cls(capacity, pd.Series(counts, index=uniques))
+        order = np.argsort(-counts, kind="stable")
+        kept = order[:capacity]
+        return cls(capacity, pd.Series(counts[kept], index=uniques[kept]), int(counts[order[capacity]]))
+
+    def update(self, values: pd.Series) -> "TopK":
+        return self.merge(TopK(self.capacity, values.value_counts(dropna=True)))
+
+    def merge(self, other: "TopK") -> "TopK":
+        if self.counts.empty:
+            counts = other.counts
+        elif other.counts.empty:
+            counts = self.counts
+        else:
+            counts = self.counts.add(other.counts, fill_value=0).astype("int64")
+        error = max(self.error, other.error)
+        if len(counts) > self.capacity:
+            counts = counts.sort_values(ascending=False, kind="stable")
+            error = max(error, int(counts.iloc[self.capacity]))
+            counts = counts.iloc[:self.capacity]
+        return TopK(self.capacity, counts, error)
+
+    @property
+    def exact(self) -> bool:
+        return self.error == 0
+
+    def most_common(self, n: int = 20) -> pd.Series:
+        return self.counts.sort_values(ascending=False, kind="stable").head(n)
+
+
+@dataclass
+class NumericSummary:
+    moments: Moments
+    median: float
+    mode: float
+    mad: float
+    quantiles: np.ndarray
+    uniques: np.ndarray
+    counts: np.ndarray
+    # Normalized rank error of median, MAD and quantiles when they come from a sketch
+    error: float | None = None
+    # Largest count dropped from the value counts, zero when they and the mode are exact
+    count_error: int = 0
+
+    def most_common(self, n: int = 20) -> pd.Series:
+        # Stable sort on the ascending uniques, so ties are listed from the smallest value
+        order = np.argsort(-self.counts, kind="stable")[:n]
+        return pd.Series(self.counts[order], index=self.uniques[order])
+
+
+def sorted_quantiles(ordered: np.ndarray, probs) -> np.ndarray:
+    # Linear interpolation between closest ranks, the default method of numpy and scipy
+    positions = (ordered.size - 1) * np.asarray(probs, dtype="float64")
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, ordered.size - 1)
+    weight = positions - lower
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * weight
+
+
+def numeric_summary(values: np.ndarray, probs=(0.25, 0.5, 0.75)) -> NumericSummary:
+    values = values[~np.isnan(values)] if values.dtype.kind == "f" else values
+    if values.size == 0:
+        return NumericSummary(Moments(), math.nan, math.nan, math.nan, np.full(len(probs), math.nan),
+                              values, np.empty(0, dtype="int64"))
+
+    # One sort gives the order statistics and the run lengths for mode and value counts
+    ordered = np.sort(values)
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    counts = np.diff(np.r_[starts, ordered.size])
+    uniques = ordered[starts]
+
+    median = float(sorted_quantiles(ordered, [0.5])[0])
+    as_float = ordered.astype("float64", copy=False)
+    return NumericSummary(
+        moments=Moments.from_values(as_float),
+        median=median,
+        mode=uniques[np.argmax(counts)],
+        mad=float(np.median(np.abs(as_float - median))),
+        quantiles=sorted_quantiles(as_float, probs),
+        uniques=uniques,
+        counts=counts
+    )
+
+
+def sketch_chunks(values: np.ndarray):
+    for start in range(0, values.size, SKETCH_CHUNK):
+        chunk = values[start:start + SKETCH_CHUNK].astype("float64", copy=False)
+        yield chunk[~np.isnan(chunk)]
+
+
+# Same summary with median, MAD and quantiles read from KLL sketches and the mode and value counts from a TopK,
+# both fed chunk by chunk, so the memory per column is bounded instead of growing with the rows.
+# The MAD needs a second pass over the distances to the approximate median.
+def sketch_summary(values: np.ndarray, probs=(0.25, 0.5, 0.75), k: int = 200, top: int = 1000) -> NumericSummary:
+    moments, quantiles, frequent = Moments(), KLLSketch(k), TopK(top)
+    for chunk in sketch_chunks(values):
+        if not chunk.size:
+            continue
+        ordered = np.sort(chunk)
+        starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+        moments = moments.merge(Moments.from_values(chunk))
+        quantiles.update(ordered)
+        frequent = frequent.merge(TopK.from_counts(top, ordered[starts], np.diff(np.r_[starts, ordered.size])))
+    median = float(quantiles.quantiles([0.5])[0])
+    mad = KLLSketch(k)
+    for chunk in sketch_chunks(values):
+        mad.update(np.abs(chunk - median))
+    counts = frequent.counts.sort_index()
+    return NumericSummary(
+        moments=moments,
+        median=median,
+        mode=counts.index[counts.to_numpy() == counts.max()].min() if not counts.empty else math.nan,
+        mad=float(mad.quantiles([0.5])[0]),
+        quantiles=quantiles.quantiles(probs),
+        uniques=counts.index.to_numpy(),
+        counts=counts.to_numpy(),
+        error=quantiles.error,
+        count_error=frequent.error
+    )
+
+
+@dataclass
+class CategoricalSummary:
+    # Distinct values in order of first appearance and how often they occur
+    uniques: pd.Index
+    counts: np.ndarray
+    rows: int
+
+    def most_common(self, n: int = 20) -> pd.Series:
+        # Stable sort on the order of appearance, the same order as Series.value_counts
+        order = np.argsort(-self.counts, kind="stable")[:n]
+        return pd.Series(self.counts[order], index=self.uniques[order])
+
+    @property
+    def mode(self):
+        # Smallest of the most frequent values, like Series.mode
+        if not self.counts.size:
+            return None
+        modes = self.uniques[self.counts == self.counts.max()]
+        try:
+            return modes.min()
+        except TypeError:
+            return modes[0]
+
+    def lengths(self) -> np.ndarray:
+        # Length of the text of every distinct value, not of every row
+        return self.uniques.astype(str).str.len().to_numpy()
+
+
+def categorical_summary(values: pd.Series) -> CategoricalSummary:
+    # One dictionary encoding, every statistic is computed from the codes and the distinct values
+    codes, uniques = pd.factorize(values)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    return CategoricalSummary(pd.Index(uniques), counts, len(values))
@@ -0,0 +1,230 @@
+import math
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from .duplicates import fold_hashes, combine_folds
+from .numerical_data import NumericalData, ColumnOverview, NumericColumns, CategoricalColumns, TEXT_TYPES
+from .schema import column_schema
+from .sketches import HyperLogLog, KLLSketch
+from .statistics import Moments, TopK
+from utils.result_cache import file_prefix_digest
+
+
+@dataclass
+class ColumnAccumulator:
+    name: str
+    dtype: str
+    numeric: bool
+    sequence: str
+    sequence_error: float | None = None
+    rows: int = 0
+    nulls: int = 0
+    memory: int = 0
+    top: TopK = field(default_factory=TopK)
+    moments: Moments = field(default_factory=Moments)
+    quantiles: KLLSketch = field(default_factory=KLLSketch)
+    distinct: HyperLogLog = field(default_factory=HyperLogLog)
+    min_length: int | None = None
+    max_length: int | None = None
+    # Hash of the column content, columns with equal hashes are reported as duplicated columns
+    content: int = 0
+
+    @classmethod
+    def for_column(cls, batch: pd.DataFrame, col) -> "ColumnAccumulator":
+        column = column_schema(batch[col])
+        return cls(name=col, dtype=column.dtype, numeric=column.numeric, sequence=column.sequence,
+                   sequence_error=column.sequence_error)
+
+    def update(self, series: pd.Series) -> "ColumnAccumulator":
+        counts = series.value_counts(dropna=True)
+        lengths = counts.index.astype(str).str.len()
+        values = series.dropna().to_numpy(dtype="float64") if self.numeric else None
+        other = ColumnAccumulator(
+            name=self.name,
+            dtype=self.dtype,
+            numeric=self.numeric,
+            sequence=self.sequence,
+            sequence_error=self.sequence_error,
+            rows=len(series),
+            nulls=int(series.isnull().sum()),
+            memory=int(series.memory_usage(deep=True, index=False)),
+            top=TopK(self.top.capacity, counts),
+            moments=Moments.from_values(values) if self.numeric else Moments(),
+            quantiles=KLLSketch().update(values) if self.numeric else KLLSketch(),
+            # Numeric batches can switch between int and float when nulls appear, so hash them as float
+            distinct=HyperLogLog().update(counts.index.to_numpy(dtype="float64") if self.numeric else counts.index.to_numpy()),
+            min_length=int(lengths.min()) if len(lengths) else None,
+            max_length=int(lengths.max()) if len(lengths) else None,
+            content=fold_hashes(pd.util.hash_pandas_object(series.astype("float64") if self.numeric else series,
+                                                           index=False).to_numpy())
+        )
+        return self.merge(other)
+
+    def merge(self, other: "ColumnAccumulator") -> "ColumnAccumulator":
+        lengths = [i for i in (self.min_length, other.min_length) if i is not None]
+        max_lengths = [i for i in (self.max_length, other.max_length) if i is not None]
+        return ColumnAccumulator(
+            name=self.name,
+            dtype=self.dtype,
+            numeric=self.numeric,
+            sequence=self.sequence,
+            sequence_error=self.sequence_error,
+            rows=self.rows + other.rows,
+            nulls=self.nulls + other.nulls,
+            memory=self.memory + other.memory,
+            top=self.top.merge(other.top),
+            moments=self.moments.merge(other.moments),
+            quantiles=self.quantiles.merge(other.quantiles),
+            distinct=self.distinct.merge(other.distinct),
+            min_length=min(lengths) if lengths else None,
+            max_length=max(max_lengths) if max_lengths else None,
+            content=combine_folds(self.content, other.content, other.rows)
+        )
+
+    @property
+    def unique(self) -> int:
+        return self.distinct.estimate()
+
+    def column_overview(self) -> ColumnOverview:
+        return ColumnOverview(
+            name=self.name,
+            number=self.rows - self.nulls,
+            unique=self.unique,
+            missing=self.nulls,
+            missing_per=round(self.nulls * 100 / self.rows, 2) if self.rows else 0.0,
+            type=self.dtype,
+            sequence=self.sequence,
+            describe_plot=None,
+            constant=self.unique == 1,
+            correlation=None,
+            unique_error=self.distinct.error,
+            sequence_error=self.sequence_error
+        )
+
+    def numeric_columns(self) -> NumericColumns:
+        m = self.moments
+        value_counts = self.top.most_common(20)
+        quantiles = self.quantiles.quantiles([0.25, 0.5, 0.75])
+        return NumericColumns(
+            name=self.name,
+            min=round(m.min, 2),
+            max=round(m.max, 2),
+            mean=round(m.mean, 2),
+            median=round(quantiles[1], 2),
+            mode=round(value_counts.index[0], 2) if not value_counts.empty else math.nan,
+            std=round(m.std, 2),
+            sum=round(m.sum, 2),
+            kurtosis=round(m.kurtosis, 2),
+            skewness=round(m.skewness, 2),
+            mad=math.nan,
+            coefficient_of_variation=round(m.variation, 2),
+            quantiles=quantiles,
+            memory=self.memory,
+            value_counts=value_counts.to_dict(),
+            frequencies=(value_counts / m.count).to_dict() if m.count else {},
+            quantile_error=self.quantiles.error,
+            count_error=self.top.error or None
+        )
+
+    def categorical_columns(self) -> CategoricalColumns:
+        value_counts = self.top.most_common(len(self.top.counts))
+        frequencies = value_counts / self.rows
+        return CategoricalColumns(
+            name=self.name,
+            unique_categories=self.unique,
+            mode=value_counts.index[0] if not value_counts.empty else None,
+            entropy=round(-(frequencies * np.log2(frequencies)).sum(), 2),
+            frequencies=frequencies.head(20).to_dict(),
+            gini=round(1 - (frequencies ** 2).sum(), 2),
+            simpson_diversity=round(1 / (frequencies ** 2).sum(), 2) if not frequencies.empty else math.nan,
+            value_counts=value_counts.head(20).to_dict(),
+            max_category_length=self.max_length,
+            min_category_length=self.min_length,
+            memory=self.memory,
+            cardinality_ratio=round(self.unique / self.rows, 3) if self.rows else None,
+            unique_error=self.distinct.error
+        )
+
+
+@dataclass
+class StreamingProfile:
+    general: NumericalData
+    columns: list[ColumnOverview]
+    numeric: list[NumericColumns]
+    categorical: list[CategoricalColumns]
+    missing: pd.Series
+    accumulators: dict
+
+
+@dataclass
+class StreamState:
+    # Accumulators after the first size bytes of a file, which end with a complete line
+    size: int
+    digest: str
+    accumulators: dict
+
+
+def stream_state(path: Path, accumulators: dict, size: int) -> StreamState | None:
+    with open(path, "rb") as fh:
+        fh.seek(max(size - 1, 0))
+        complete = size == 0 or fh.read(1) in (b"\n", b"\r")
+    if not complete or not accumulators:
+        return None
+    return StreamState(size, file_prefix_digest(path, size), accumulators)
+
+
+def appended_offset(path: Path, state: StreamState | None) -> int | None:
+    # The file only had rows appended if it starts with exactly the bytes that were profiled before
+    if state is None or path.stat().st_size < state.size:
+        return None
+    return state.size if file_prefix_digest(path, state.size) == state.digest else None
+
+
+def missing_column(acc: ColumnAccumulator, batch: pd.DataFrame) -> pd.Series:
+    return pd.Series(math.nan if acc.numeric else None, index=batch.index, name=acc.name,
+                     dtype="float64" if acc.numeric else object)
+
+
+def profile_batches(batches: Iterable[pd.DataFrame], filename: str, accumulators: dict | None = None) -> StreamingProfile:
+    # Accumulators of an earlier run continue with the new batches, so appended rows are profiled on their own
+    accumulators = dict(accumulators or {})
+    rows = max((acc.rows for acc in accumulators.values()), default=0)
+    for batch in batches:
+        # Columns of JSON records can first appear in a later batch, their earlier rows count as missing
+        for col in batch.columns:
+            if col not in accumulators:
+                accumulators[col] = replace(ColumnAccumulator.for_column(batch, col), rows=rows, nulls=rows)
+        for col, acc in accumulators.items():
+            accumulators[col] = acc.update(batch[col] if col in batch.columns else missing_column(acc, batch))
+        rows += len(batch)
+
+    columns = list(accumulators.values())
+    rows = columns[0].rows if columns else 0
+    nulls = sum(acc.nulls for acc in columns)
+    size = rows * len(columns)
+    general = NumericalData(
+        filename=filename,
+        rows=rows,
+        cols=len(columns),
+        nulls=nulls,
+        nulls_percentage=round(nulls * 100 / size, 2) if size else 0.0,
+        dup_row=None,
+        # Without the values at hand, columns count as duplicated when their content hashes are equal
+        dup_col=len(columns) - len({acc.content for acc in columns}),
+        memory=sum(acc.memory for acc in columns),
+        alerts=0
+    )
+    categorical_types = TEXT_TYPES + ('bool', 'int64', 'float64')
+    return StreamingProfile(
+        general=general,
+        columns=[acc.column_overview() for acc in columns],
+        numeric=[acc.numeric_columns() for acc in columns if acc.numeric],
+        categorical=[acc.categorical_columns() for acc in columns
+                     if acc.dtype in categorical_types and acc.sequence == 'None'],
+        missing=pd.Series({acc.name: acc.nulls for acc in columns}, dtype="int64"),
+        accumulators=accumulators
+    )
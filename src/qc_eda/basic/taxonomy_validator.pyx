@@ -1,68 +1,136 @@
 # cython: language_level=3
 
+cimport cython
+import numpy as np
+from libc.stdint cimport int32_t, int64_t, uint8_t
+
 cdef enum TaxonomyValidationFlags:
-    INVALID_CAPITALIZATION = 1
-    CONTAINS_STRAIN_INFO = 2
-    INVALID_CHARACTERS = 3
-
-cdef const char * INVALID_CAPITALIZATION_STR = b"invalid_capitalization"
-cdef const char * CONTAINS_STRAIN_INFO_STR = b"contains_strain_info"
-cdef const char * INVALID_CHARACTERS_STR = b"invalid_characters"
-
-cdef inline str cstr_to_str(const char * cmsg) except*:
-    return (<bytes> cmsg).decode("utf-8")
-
-cdef inline str get_flag_string(TaxonomyValidationFlags flag):
-    if flag == INVALID_CAPITALIZATION:
-        return cstr_to_str(INVALID_CAPITALIZATION_STR)
-    elif flag == CONTAINS_STRAIN_INFO:
-        return cstr_to_str(CONTAINS_STRAIN_INFO_STR)
-    elif flag == INVALID_CHARACTERS:
-        return cstr_to_str(INVALID_CHARACTERS_STR)
-    return ""
-
-cdef list strain_keywords = ["strain", "isolate", "clone", "var.", "ATCC", "DSM"]
-
-cpdef list validate_taxonomy(name):
-    cdef list flags = []
-    cdef str stripped_name, lower_name
-    cdef Py_UCS4 c
-    cdef int i, n
+    FLAG_CAPITALIZATION = 1
+    FLAG_STRAIN_INFO = 2
+    FLAG_CHARACTERS = 4
 
-    if name is None:
-        raise ValueError("Taxonomy name must not be None")
+# Bits of the flags returned for every name
+INVALID_CAPITALIZATION = FLAG_CAPITALIZATION
+CONTAINS_STRAIN_INFO = FLAG_STRAIN_INFO
+INVALID_CHARACTERS = FLAG_CHARACTERS
+FLAG_NAMES = {
+    INVALID_CAPITALIZATION: "invalid_capitalization",
+    CONTAINS_STRAIN_INFO: "contains_strain_info",
+    INVALID_CHARACTERS: "invalid_characters",
+}
 
-    stripped_name = name.strip()
-    if not stripped_name:
-        raise ValueError("Taxonomy name must not be empty")
+strain_keywords = ["strain", "isolate", "clone", "var.", "ATCC", "DSM"]
+
+
+def build_automaton(keywords):
+    """Aho-Corasick automaton over lowercase bytes as a dense transition table, failure links already followed."""
+    goto = [dict()]
+    output = [False]
+    for keyword in keywords:
+        state = 0
+        for byte in keyword.lower().encode("utf-8"):
+            if byte not in goto[state]:
+                goto.append(dict())
+                output.append(False)
+                goto[state][byte] = len(goto) - 1
+            state = goto[state][byte]
+        output[state] = True
+
+    transitions = np.zeros((len(goto), 256), dtype=np.int32)
+    fail = [0] * len(goto)
+    queue = []
+    for byte, state in goto[0].items():
+        transitions[0, byte] = state
+        queue.append(state)
+    # Breadth first, so the failure state of every state is complete before its children need it
+    while queue:
+        state = queue.pop(0)
+        output[state] = output[state] or output[fail[state]]
+        transitions[state] = transitions[fail[state]]
+        for byte, child in goto[state].items():
+            fail[child] = transitions[fail[state], byte]
+            transitions[state, byte] = child
+            queue.append(child)
+    return transitions, np.array(output, dtype=np.uint8)
+
+
+_TRANSITIONS, _MATCHES = build_automaton(strain_keywords)
 
-    if len(stripped_name) < 3 or " " not in stripped_name:
-        return flags
 
-    if len(name) < 2 or not name[0][0].isupper():
-        return flags
-    if not stripped_name[0].isupper() or " " not in stripped_name:
-        flags.append(get_flag_string(INVALID_CAPITALIZATION))
+cdef inline bint is_space(uint8_t c) nogil:
+    return c == 32 or 9 <= c <= 13
 
-    lower_name = stripped_name.lower()
 
-    for kw in strain_keywords:
-        if kw.lower() in lower_name:
-            flags.append(get_flag_string(CONTAINS_STRAIN_INFO))
-            break
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def validate_buffer(const uint8_t[::1] data, const int64_t[::1] offsets,
+                    const int32_t[:, ::1] transitions=_TRANSITIONS, const uint8_t[::1] matches=_MATCHES):
+    """Flags of every string in an Arrow style buffer, string i is data[offsets[i]:offsets[i + 1]].
 
-    n = len(stripped_name)
-    for i in range(n):
-        c = stripped_name[i]
-        if c.isdigit() or not (c.isalpha() or c in " -."):
-            flags.append(get_flag_string(INVALID_CHARACTERS))
-            break
+    Names without a space after stripping, like higher taxa, are not checked. Bytes of multibyte UTF-8
+    characters count as letters."""
+    cdef Py_ssize_t n = offsets.shape[0] - 1
+    flags_array = np.zeros(n, dtype=np.uint8)
+    cdef uint8_t[::1] flags = flags_array
+    cdef Py_ssize_t i, j, start, end
+    cdef int32_t state
+    cdef uint8_t c, flag
+    cdef bint space
 
-    return flags
+    with nogil:
+        for i in range(n):
+            start = offsets[i]
+            end = offsets[i + 1]
+            while start < end and is_space(data[start]):
+                start += 1
+            while end > start and is_space(data[end - 1]):
+                end -= 1
+            if end - start < 3:
+                continue
+            space = False
+            for j in range(start, end):
+                if data[j] == 32:
+                    space = True
+                    break
+            if not space:
+                continue
 
-cpdef dict batch_validate(list names):
-    cdef dict results = {}
-    cdef str name
-    for name in names:
-        results[name] = validate_taxonomy(name)
-    return results
+            flag = 0
+            c = data[start]
+            if c < 128 and not (65 <= c <= 90):
+                flag |= FLAG_CAPITALIZATION
+            state = 0
+            for j in range(start, end):
+                c = data[j]
+                if 65 <= c <= 90:
+                    state = transitions[state, c + 32]
+                else:
+                    state = transitions[state, c]
+                    if c < 128 and not (97 <= c <= 122 or c == 32 or c == 45 or c == 46):
+                        flag |= FLAG_CHARACTERS
+                if matches[state]:
+                    flag |= FLAG_STRAIN_INFO
+            flags[i] = flag
+    return flags_array
+
+
+def flag_names(int flags):
+    return [name for bit, name in FLAG_NAMES.items() if flags & bit]
+
+
+def batch_validate(list names):
+    """Flag names of every distinct name, names are encoded once into one buffer."""
+    unique = list(dict.fromkeys(names))
+    encoded = [name.encode("utf-8") for name in unique]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(name) for name in encoded])
+    flags = validate_buffer(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+    return {name: flag_names(flag) for name, flag in zip(unique, flags)}
+
+
+def validate_taxonomy(name):
+    if name is None:
+        raise ValueError("Taxonomy name must not be None")
+    if not name.strip():
+        raise ValueError("Taxonomy name must not be empty")
+    return batch_validate([name])[name]
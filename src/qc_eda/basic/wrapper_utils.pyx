@@ -4,15 +4,13 @@ cimport cython
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def fast_check_sequence(list sequences, pattern):
-    cdef int i, n = len(sequences)
+def residue_mask(const unsigned char[::1] data, const unsigned char[::1] table, unsigned char mask=0xFF):
+    """AND the residue class bitmasks of all bytes, stops as soon as no class is left."""
+    cdef Py_ssize_t i, n = data.shape[0]
 
-    for i in range(n):
-        if sequences[i] is None:
-            continue
-        try:
-            if not pattern.fullmatch(sequences[i]):
-                return False
-        except:
-            return False
-    return True
\ No newline at end of file
+    with nogil:
+        for i in range(n):
+            mask &= table[data[i]]
+            if mask == 0:
+                break
+    return mask
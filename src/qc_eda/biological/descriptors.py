@@ -0,0 +1,139 @@
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+from peptides import tables
+
+from .sequences import SequenceBuffer, DistributionSummary, distribution_summary
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+# Residue codes are the letter index, bytes outside A-Z count as unknown residue X like in peptides
+CODES = np.full(256, LETTERS.index("X"), dtype=np.intp)
+CODES[ord("A"):ord("Z") + 1] = np.arange(len(LETTERS))
+# Bisection steps for the isoelectric point, the bracket shrinks to 14 / 2 ** 35 pH units
+PI_ITERATIONS = 35
+LN10 = np.log(10)
+
+DESCRIPTOR_NAMES = {
+    "length": "Length",
+    "molecular_weight": "Molecular Weight (Da)",
+    "isoelectric_point": "Isoelectric Point",
+    "charge": "Charge (pH 7)",
+    "hydrophobicity": "Hydrophobicity",
+    "aliphatic_index": "Aliphatic Index",
+    "boman": "Boman Index",
+    "aromaticity": "Aromaticity",
+    "instability": "Instability Index",
+}
+
+
+def residue_scale(table: Dict[str, float], default: float = 0.0) -> np.ndarray:
+    return np.array([table.get(letter, default) for letter in LETTERS])
+
+
+def pair_scale(table: Dict[str, float], default: float = 1.0) -> np.ndarray:
+    return np.array([table.get(a + b, default) for a in LETTERS for b in LETTERS])
+
+
+MOLECULAR_WEIGHT = residue_scale(tables.MOLECULAR_WEIGHT["expasy"])
+WATER = tables.MOLECULAR_WEIGHT["expasy"]["H2O"]
+HYDROPHOBICITY = residue_scale(tables.HYDROPHOBICITY["KyteDoolittle"])
+BOMAN = residue_scale(tables.BOMAN["Boman"])
+INSTABILITY = pair_scale(tables.INSTABILITY["Guruprasad"])
+SIGN = residue_scale(tables.CHARGE["sign"])
+CHARGED = np.flatnonzero(SIGN)
+AROMATIC = residue_scale({"F": 1.0, "W": 1.0, "Y": 1.0})
+ALIPHATIC = residue_scale({"A": 1.0, "V": 2.9, "L": 3.9, "I": 3.9, "J": 3.9})
+
+
+@dataclass
+class ProteinDescriptors:
+    # Residue count matrix with one row per sequence and one column per letter of LETTERS
+    counts: np.ndarray
+    length: np.ndarray
+    molecular_weight: np.ndarray
+    isoelectric_point: np.ndarray
+    charge: np.ndarray
+    hydrophobicity: np.ndarray
+    aliphatic_index: np.ndarray
+    boman: np.ndarray
+    aromaticity: np.ndarray
+    instability: np.ndarray
+
+    def frequencies(self) -> List[Dict[str, float]]:
+        return [{LETTERS[j]: row[j] / length for j in np.flatnonzero(row)}
+                for row, length in zip(self.counts, self.length.tolist())]
+
+    def distributions(self, weights: np.ndarray | None = None) -> Dict[str, DistributionSummary]:
+        # Descriptors of unique sequences are repeated by their count, so the distribution covers every row
+        return {label: distribution_summary(np.repeat(getattr(self, name), weights) if weights is not None
+                                            else getattr(self, name))
+                for name, label in DESCRIPTOR_NAMES.items()}
+
+
+def residue_counts(buffer: SequenceBuffer) -> np.ndarray:
+    rows = np.repeat(np.arange(len(buffer)), buffer.lengths)
+    flat = np.bincount(rows * len(LETTERS) + CODES[buffer.data], minlength=len(buffer) * len(LETTERS))
+    return flat.reshape(len(buffer), len(LETTERS))
+
+
+def charge(counts: np.ndarray, pH: float | np.ndarray, pk_scale: str = "Lehninger") -> np.ndarray:
+    return _net_charge(counts[:, CHARGED], pH, tables.PK[pk_scale])
+
+
+def _net_charge(charged: np.ndarray, pH: float | np.ndarray, scale: Dict[str, float]) -> np.ndarray:
+    pka = residue_scale(scale)[CHARGED]
+    pH = np.asarray(pH, dtype="float64")[..., None]
+    # Henderson-Hasselbalch charge of every charged residue type, for one pH or one pH per sequence
+    residue = SIGN[CHARGED] / (1.0 + np.exp(LN10 * SIGN[CHARGED] * (pH - pka)))
+    total = (charged * residue).sum(axis=1)
+    total += 1.0 / (1.0 + np.exp(LN10 * (pH[..., 0] - scale["nTer"])))
+    total -= 1.0 / (1.0 + np.exp(LN10 * (scale["cTer"] - pH[..., 0])))
+    return total
+
+
+def isoelectric_point(counts: np.ndarray, pk_scale: str = "EMBOSS") -> np.ndarray:
+    # Bisection on all sequences at once, the net charge decreases with the pH
+    charged = counts[:, CHARGED].astype("float64")
+    scale = tables.PK[pk_scale]
+    low = np.zeros(counts.shape[0])
+    high = np.full(counts.shape[0], 14.0)
+    for _ in range(PI_ITERATIONS):
+        middle = (low + high) / 2
+        positive = _net_charge(charged, middle, scale) >= 0
+        low = np.where(positive, middle, low)
+        high = np.where(positive, high, middle)
+    return (low + high) / 2
+
+
+def instability(buffer: SequenceBuffer) -> np.ndarray:
+    # Dipeptide weight of every pair of adjacent bytes, pairs across two sequences are zeroed so that
+    # one reduceat per sequence start sums exactly the pairs inside each sequence
+    codes = CODES[buffer.data]
+    weights = INSTABILITY[codes[:-1] * len(LETTERS) + codes[1:]]
+    boundaries = buffer.offsets[1:-1] - 1
+    weights[boundaries[(boundaries >= 0) & (boundaries < weights.size)]] = 0.0
+    result = np.zeros(len(buffer))
+    rows = np.flatnonzero(buffer.lengths >= 2)
+    if rows.size:
+        result[rows] = np.add.reduceat(weights, buffer.offsets[rows])
+    return result
+
+
+def protein_descriptors(buffer: SequenceBuffer) -> ProteinDescriptors:
+    counts = residue_counts(buffer)
+    length = buffer.lengths
+    # Empty sequences get 0 for every per residue average instead of a division by zero
+    per_residue = np.where(length > 0, 1.0 / np.maximum(length, 1), 0.0)
+    return ProteinDescriptors(
+        counts=counts,
+        length=length,
+        molecular_weight=counts @ MOLECULAR_WEIGHT + WATER,
+        isoelectric_point=isoelectric_point(counts),
+        charge=charge(counts, 7.0),
+        hydrophobicity=counts @ HYDROPHOBICITY * per_residue,
+        aliphatic_index=counts @ ALIPHATIC * per_residue * 100,
+        boman=-(counts @ BOMAN) * per_residue,
+        aromaticity=counts @ AROMATIC * per_residue,
+        instability=instability(buffer) * 10 * per_residue
+    )
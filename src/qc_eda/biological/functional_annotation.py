@@ -1,4 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 from utils.download_metadata import get_clusters_of_orthologous_groups, get_gene_ontology
 
@@ -9,15 +11,38 @@ class AnnotationFlags:
     valid_annotation: set | str | None
 
 
-def annotation_flags(df, col, annotation_type) -> AnnotationFlags | None:
-    if annotation_type == "cog":
-        cog_df = get_clusters_of_orthologous_groups()
-        results = validate_annotation(df[col], cog_df, "COG_ID")
-    elif annotation_type == "go":
-        go_df = get_gene_ontology()
-        results = validate_annotation(df[col], go_df, "GO_ID")
-    else:
+@dataclass(frozen=True)
+class ReferenceVocabulary:
+    name: str
+    # Checksum of the downloaded vocabulary, the repr is part of the keys of cached column results
+    checksum: str
+    ids: frozenset = field(repr=False)
+    clean_ids: frozenset = field(repr=False)
+
+
+VOCABULARIES = {
+    "cog": (get_clusters_of_orthologous_groups, "COG_ID"),
+    "go": (get_gene_ontology, "GO_ID"),
+}
+
+
+@lru_cache(maxsize=None)
+def get_vocabulary(annotation_type: str) -> ReferenceVocabulary:
+    if annotation_type not in VOCABULARIES:
         raise ValueError(f"Unknown annotation type: {annotation_type}")
+    loader, id_column = VOCABULARIES[annotation_type]
+    vocabulary = loader()
+    ids = vocabulary[id_column].dropna()
+    return ReferenceVocabulary(
+        name=annotation_type,
+        checksum=vocabulary.attrs.get("checksum", ""),
+        ids=frozenset(ids),
+        clean_ids=frozenset(clean_strings(ids))
+    )
+
+
+def annotation_flags(df, col, vocabulary: ReferenceVocabulary) -> AnnotationFlags | None:
+    results = validate_annotation(df[col], vocabulary)
 
     return AnnotationFlags(
         name=col,
@@ -26,16 +51,15 @@ def annotation_flags(df, col, annotation_type) -> AnnotationFlags | None:
     )
 
 
-def validate_annotation(col: pd.Series, annotation_df: pd.DataFrame, id_column: str,
+def validate_annotation(col: pd.Series, vocabulary: ReferenceVocabulary,
                         threshold: float = 0.8) -> set | str | None:
     col_cleaned = clean_strings(col)
-    valid_annotations = set(clean_strings(annotation_df[id_column]))
 
-    is_valid = col_cleaned.isin(valid_annotations)
+    is_valid = is_member(col_cleaned, vocabulary.clean_ids)
     validity_rate = is_valid.mean()
 
     if validity_rate < threshold:
-        is_valid_raw = col.isin(annotation_df[id_column])
+        is_valid_raw = is_member(col, vocabulary.ids)
         validity_rate_raw = is_valid_raw.mean()
         if validity_rate_raw > validity_rate:
             is_valid = is_valid_raw
@@ -50,5 +74,12 @@ def validate_annotation(col: pd.Series, annotation_df: pd.DataFrame, id_column:
 
     return None
 
+def is_member(col: pd.Series, ids: frozenset) -> np.ndarray:
+    # Probe the shared hash set once per distinct value instead of hashing the vocabulary per column
+    codes, uniques = pd.factorize(col)
+    found = np.fromiter((value in ids for value in uniques), dtype=bool, count=len(uniques))
+    return np.append(found, False)[codes]
+
+
 def clean_strings(series: pd.Series) -> pd.Series:
-    return series.astype(str).str.strip().str.upper()
\ No newline at end of file
+    return series.astype(str).str.strip().str.upper()
@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from typing import Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .sequences import SequenceBuffer
+
+INVALID = 255
+# Codes of a k-mer packed into one 64 bit word are exact up to this length, longer k-mers are hashed
+MAX_PACKED_BITS = 64
+# Largest code space that is counted with np.bincount instead of sorting
+MAX_BINCOUNT = 1 << 22
+HASH_BASE = np.uint64(0x9E3779B97F4A7C15)
+
+
+@dataclass(frozen=True)
+class Alphabet:
+    letters: str
+    bits: int
+    complement: np.ndarray | None
+    table: np.ndarray
+
+
+def _alphabet(letters: str, bits: int, aliases: dict[str, str] | None = None, complement: str | None = None) -> Alphabet:
+    table = np.full(256, INVALID, dtype=np.uint8)
+    for code, letter in enumerate(letters):
+        table[ord(letter)] = table[ord(letter.lower())] = code
+    for alias, letter in (aliases or {}).items():
+        table[ord(alias)] = table[ord(alias.lower())] = letters.index(letter)
+    comp = np.array([letters.index(c) for c in complement], dtype=np.uint64) if complement else None
+    return Alphabet(letters, bits, comp, table)
+
+
+# Letters are in alphabetical order, so sorting codes sorts the k-mers lexicographically
+ALPHABETS = {
+    "dna": _alphabet("ACGT", 2, aliases={"U": "T"}, complement="TGCA"),
+    "protein": _alphabet("ABCDEFGHIJKLMNOPQRSTUVWXYZ", 5),
+}
+
+
+@dataclass
+class KmerCounts:
+    k: int
+    alphabet: str
+    codes: np.ndarray
+    counts: np.ndarray
+    canonical: bool
+    # Window start in the encoded buffer for every code, only needed to decode hashed k-mers
+    positions: np.ndarray | None
+    buffer: np.ndarray | None
+
+
+def encode(seqs: Iterable[str] | SequenceBuffer, alphabet: Alphabet) -> np.ndarray:
+    # Sequences are joined with a separator that maps to INVALID, so no window spans two sequences
+    if isinstance(seqs, SequenceBuffer):
+        return alphabet.table[seqs.joined()]
+    joined = "\0".join(seqs).encode("ascii", errors="replace")
+    return alphabet.table[np.frombuffer(joined, dtype=np.uint8)]
+
+
+def _windows(codes: np.ndarray, k: int, alphabet: Alphabet, canonical: bool):
+    n = codes.size - k + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.intp)
+    invalid = np.concatenate([[0], np.cumsum(codes == INVALID)])
+    valid = np.flatnonzero(invalid[k:] - invalid[:n] == 0)
+
+    values = np.where(codes == INVALID, 0, codes).astype(np.uint64)
+    packed = alphabet.bits * k <= MAX_PACKED_BITS
+    shift = np.uint64(alphabet.bits)
+    forward = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        part = values[j:j + n]
+        forward = (forward << shift) | part if packed else forward * HASH_BASE + part
+
+    if canonical:
+        if alphabet.complement is None:
+            raise ValueError("Canonical k-mers are only defined for nucleotide sequences")
+        complement = alphabet.complement[values.astype(np.intp)]
+        backward = np.zeros(n, dtype=np.uint64)
+        for j in reversed(range(k)):
+            part = complement[j:j + n]
+            backward = (backward << shift) | part if packed else backward * HASH_BASE + part
+        forward = np.minimum(forward, backward)
+    return forward[valid], valid
+
+
+def count_kmers(seqs: Iterable[str] | SequenceBuffer, k: int, alphabet: str = "dna", canonical: bool = False) -> KmerCounts:
+    if k < 1:
+        raise ValueError(f"k must be positive, got {k}")
+    spec = ALPHABETS[alphabet]
+    buffer = encode(seqs, spec)
+    kmers, positions = _windows(buffer, k, spec, canonical)
+
+    packed = spec.bits * k <= MAX_PACKED_BITS
+    if packed and (1 << (spec.bits * k)) <= MAX_BINCOUNT:
+        counts = np.bincount(kmers.astype(np.intp), minlength=1 << (spec.bits * k))
+        codes = np.flatnonzero(counts).astype(np.uint64)
+        return KmerCounts(k, alphabet, codes, counts[codes.astype(np.intp)], canonical, None, None)
+
+    codes, first, counts = np.unique(kmers, return_index=True, return_counts=True)
+    if packed:
+        return KmerCounts(k, alphabet, codes, counts, canonical, None, None)
+    return KmerCounts(k, alphabet, codes, counts, canonical, positions[first], buffer)
+
+
+def decode(result: KmerCounts, index: np.ndarray) -> List[str]:
+    spec = ALPHABETS[result.alphabet]
+    letters = np.frombuffer(spec.letters.encode("ascii"), dtype=np.uint8)
+    if result.buffer is None:
+        codes = result.codes[index]
+        mask = np.uint64((1 << spec.bits) - 1)
+        digits = np.stack([(codes >> np.uint64(spec.bits * (result.k - 1 - j))) & mask for j in range(result.k)], axis=-1)
+        return [row.tobytes().decode("ascii") for row in letters[digits.astype(np.intp)]]
+
+    kmers = []
+    for i in index:
+        window = result.buffer[result.positions[i]:result.positions[i] + result.k].astype(np.intp)
+        kmer = letters[window].tobytes().decode("ascii")
+        if result.canonical:
+            # Hashes do not preserve order, so pick the lexicographically smaller strand here
+            reverse = letters[spec.complement[window[::-1]].astype(np.intp)].tobytes().decode("ascii")
+            kmer = min(kmer, reverse)
+        kmers.append(kmer)
+    return kmers
+
+
+def most_common(result: KmerCounts, top: int = 5) -> List[Tuple[str, int]]:
+    if result.counts.size == 0:
+        return []
+    top = min(top, result.counts.size)
+    # argpartition finds the count threshold, ties at the threshold are resolved by code order
+    threshold = result.counts[np.argpartition(-result.counts, top - 1)[top - 1]]
+    candidates = np.flatnonzero(result.counts >= threshold)
+    order = candidates[np.lexsort((result.codes[candidates], -result.counts[candidates]))][:top]
+    return list(zip(decode(result, order), result.counts[order].tolist()))
+
+
+def top_kmers(seqs: Iterable[str] | pd.Series | SequenceBuffer, k: int = 3, top: int = 5, alphabet: str = "dna",
+              canonical: bool = False) -> List[Tuple[str, int]]:
+    if isinstance(seqs, pd.Series):
+        seqs = seqs.dropna().astype(str)
+    return most_common(count_kmers(seqs, k, alphabet, canonical), top)
@@ -0,0 +1,87 @@
+import math
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from .sequences import SequenceBuffer
+
+# Colors of the WebLogo schemes that were used before
+COLOR_SCHEMES: Dict[str, Dict[str, str]] = {
+    "color_classic": {"A": "#008000", "C": "#0000FF", "G": "#FFA500", "T": "#FF0000", "U": "#FF0000"},
+    "color_chemistry": {
+        **dict.fromkeys("GSTYC", "#008000"),
+        **dict.fromkeys("NQ", "#800080"),
+        **dict.fromkeys("KRH", "#0000FF"),
+        **dict.fromkeys("DE", "#FF0000"),
+        **dict.fromkeys("AVLIPWFM", "#000000"),
+    },
+}
+# Number of letters the maximum information content is based on
+ALPHABET_SIZES = {"color_classic": 4, "color_chemistry": 20}
+
+COLUMN_WIDTH = 20
+LOGO_HEIGHT = 200
+MARGIN_LEFT = 45
+MARGIN_BOTTOM = 25
+MARGIN_TOP = 10
+# Cap height of a bold sans-serif font relative to the font size, used to scale letters to their stack height
+CAP_HEIGHT = 0.72
+FONT_SIZE = 100
+
+
+def position_counts(buffer: SequenceBuffer) -> np.ndarray:
+    # One bincount over the whole column of equal length sequences, rows are positions, columns are bytes
+    width = int(buffer.lengths[0])
+    positions = np.tile(np.arange(width), len(buffer))
+    return np.bincount(positions * 256 + buffer.data, minlength=width * 256).reshape(width, 256)
+
+
+def information_content(counts: np.ndarray, alphabet_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    totals = counts.sum(axis=1, keepdims=True)
+    frequencies = np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entropy = -np.where(frequencies > 0, frequencies * np.log2(frequencies), 0.0).sum(axis=1)
+    return frequencies, np.maximum(math.log2(alphabet_size) - entropy, 0.0)
+
+
+def make_logo(buffer: SequenceBuffer, color: str) -> str:
+    colors = COLOR_SCHEMES[color]
+    max_bits = math.log2(ALPHABET_SIZES[color])
+    frequencies, bits = information_content(position_counts(buffer), ALPHABET_SIZES[color])
+
+    width = MARGIN_LEFT + COLUMN_WIDTH * frequencies.shape[0] + 5
+    height = MARGIN_TOP + LOGO_HEIGHT + MARGIN_BOTTOM
+    bottom = MARGIN_TOP + LOGO_HEIGHT
+    scale = LOGO_HEIGHT / max_bits
+    parts: List[str] = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'style="width: 100%; height: 250px; max-width: 800px;" font-family="Arial, Helvetica, sans-serif">',
+        f'<line x1="{MARGIN_LEFT}" y1="{MARGIN_TOP}" x2="{MARGIN_LEFT}" y2="{bottom}" stroke="black"/>',
+        f'<text x="12" y="{MARGIN_TOP + LOGO_HEIGHT / 2}" font-size="12" text-anchor="middle" '
+        f'transform="rotate(-90 12 {MARGIN_TOP + LOGO_HEIGHT / 2})">bits</text>',
+    ]
+    for tick in range(int(max_bits) + 1):
+        y = bottom - tick * scale
+        parts.append(f'<line x1="{MARGIN_LEFT - 4}" y1="{y:.2f}" x2="{MARGIN_LEFT}" y2="{y:.2f}" stroke="black"/>')
+        parts.append(f'<text x="{MARGIN_LEFT - 6}" y="{y + 4:.2f}" font-size="11" text-anchor="end">{tick}</text>')
+
+    for position, (row, total) in enumerate(zip(frequencies, bits)):
+        x = MARGIN_LEFT + position * COLUMN_WIDTH
+        parts.append(f'<text x="{x + COLUMN_WIDTH / 2}" y="{bottom + 15}" font-size="10" '
+                     f'text-anchor="middle">{position + 1}</text>')
+        # Smallest letters at the bottom of the stack, as in WebLogo
+        y = bottom
+        for code in np.argsort(row, kind="stable"):
+            letter_height = row[code] * total * scale
+            if letter_height < 0.5:
+                continue
+            letter = chr(code)
+            parts.append(
+                f'<text transform="translate({x + COLUMN_WIDTH / 2:.2f},{y:.2f}) '
+                f'scale({COLUMN_WIDTH / (FONT_SIZE * 0.68):.4f},{letter_height / (FONT_SIZE * CAP_HEIGHT):.4f})" '
+                f'font-size="{FONT_SIZE}" font-weight="bold" text-anchor="middle" '
+                f'fill="{colors.get(letter, "#808080")}">{escape(letter)}</text>')
+            y -= letter_height
+    parts.append('</svg>')
+    return "".join(parts)
@@ -1,52 +1,134 @@
-import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import List, Dict
 
+import numpy as np
 import pandas as pd
 
-from qc_eda.basic.numerical_data import ColumnOverview
-from ..basic.measurement_enum import MEASUREMENTS
+from qc_eda.basic.numerical_data import ColumnOverview, TEXT_TYPES
+from qc_eda.basic.statistics import numeric_summary
+from ..basic.measurement_enum import MEASUREMENTS, UNIT_TABLE, OFFSETS
+
+# Share of the non-missing values that have to be a known unit, with or without a number
+MEASUREMENT_THRESHOLD = 0.8
+# Word units like 'min' or 'units' are also found when written in another case
+UNIT_TABLE_LOWER = {unit.lower(): value for unit, value in UNIT_TABLE.items() if len(unit) > 2}
+
 
 @dataclass
 class UNITColumns:
     units: List[str]
-    unit_counts: List[Dict[str | None, int]]
+    unit_counts: Dict[str | None, int]
     with_measurement: bool
+    # Unit all magnitudes are converted to, the SI unit of the most frequent kind of unit
+    si_unit: str | None = None
+    # Statistics of the magnitudes in si_unit
+    statistics: Dict[str, float] = field(default_factory=dict)
+
+
+@lru_cache(maxsize=4096)
+def si_conversion(unit: str) -> tuple[str, float, float] | None:
+    # (SI unit, factor, offset) of a unit like 'mg', '°C' or 'mmol/L', None for unknown units
+    unit = unit.strip()
+    if unit in UNIT_TABLE or unit.lower() in UNIT_TABLE_LOWER:
+        si_unit, factor = UNIT_TABLE[unit] if unit in UNIT_TABLE else UNIT_TABLE_LOWER[unit.lower()]
+        return si_unit, factor, OFFSETS.get(unit, 0.0)
+    if '/' not in unit:
+        return None
+    numerator, *denominators = unit.split('/')
+    # '1/s' arrives as the number 1 and the unit '/s'
+    parts = [si_conversion(part) if part.strip() else ('1', 1.0, 0.0) for part in [numerator, *denominators]]
+    if any(part is None for part in parts):
+        return None
+    factor = parts[0][1] / np.prod([part[1] for part in parts[1:]])
+    return '/'.join(part[0] for part in parts), float(factor), 0.0
+
+
+def parse_units(uniques) -> pd.DataFrame:
+    # Magnitude, unit and magnitude in the SI unit of distinct values, with one vectorized regex over
+    # the values and one lookup per distinct unit
+    parts = pd.Series(uniques, dtype=object).astype(str).str.extract(MEASUREMENTS.VALUE_AND_UNIT.value)
+    number = pd.to_numeric(parts['value'].str.replace(',', '.', regex=False), errors='coerce')
+    unit = parts['unit'].fillna('')
+    conversions = pd.DataFrame([(u, *si_conversion(u)) for u in unit.unique() if u and si_conversion(u)],
+                               columns=['unit', 'si_unit', 'factor', 'offset']).set_index('unit')
+    conversion = conversions.reindex(unit)
+    # A value is recognized when it is a known unit, with or without a number in front
+    known = conversion['si_unit'].notna().to_numpy()
+    return pd.DataFrame({
+        'value': number,
+        'unit': unit.where(known, None),
+        'si_unit': conversion['si_unit'].to_numpy(),
+        'si_value': number * conversion['factor'].to_numpy() + conversion['offset'].to_numpy(),
+        'recognized': known,
+    })
+
+
+def parse_measurements(values: pd.Series) -> pd.DataFrame:
+    # parse_units for every row, each distinct value is only parsed once
+    codes, uniques = pd.factorize(values)
+    parsed = parse_units(uniques)
+    # Missing values have code -1 and pick the appended empty row
+    parsed = pd.concat([parsed, pd.DataFrame({'recognized': [False]})], ignore_index=True)
+    return parsed.iloc[codes].set_index(values.index)
 
 
 def measurement_columns(column_overview: ColumnOverview, df: pd.DataFrame) -> UNITColumns | bool:
-    if column_overview.sequence == 'None':
-        name_match = MEASUREMENTS.UNIT_IN_COL_TITLE.value.match(column_overview.name)
-        if name_match:
-            unit: str = name_match.group(0).lstrip('[').rstrip(']')
-            return UNITColumns(
-                units=[unit],
-                unit_counts=[{unit: 1}],
-                with_measurement=False
-            )
-        if column_overview.type == 'object':
-            values = df[column_overview.name].dropna().unique().astype(str).tolist()
-            if all(len(x) > 1 for x in values):
-                measurement_and_unit = match_units(values, MEASUREMENTS.UNIT_COLUMN.value)
-                if len(measurement_and_unit) > 0:
-                    return UNITColumns(
-                        units=[unit.split(' ')[1] if ' ' in unit else unit for unit in measurement_and_unit],
-                        unit_counts=df[column_overview.name].value_counts(dropna=False).to_dict(),
-                        with_measurement=any([has_number_and_unit(unit) for unit in measurement_and_unit])
-                    )
-    return False
-
-def match_units(entries: List[str], regex: re.Pattern) -> List[str]:
-    units: List[str] = []
-    for entrie in entries:
-        measurement_and_unit = regex.fullmatch(entrie)
-        if measurement_and_unit:
-            units.append(measurement_and_unit.group(0))
-    return units
-
-def has_number_and_unit(value: str) -> bool:
-    special_units = {'1/s', '1/m', '1/M', '1/h', '1/min'} # Add new ones, if needed
-    if value in special_units:
+    if column_overview.sequence != 'None':
+        return False
+    series = df[column_overview.name]
+    name_match = MEASUREMENTS.UNIT_IN_COL_TITLE.value.search(str(column_overview.name))
+    if name_match:
+        # Numbers in a column whose name gives the unit, e.g. 'glucose [mmol/L]'
+        unit = name_match.group(1).strip()
+        conversion = si_conversion(unit)
+        if conversion is None:
+            return False
+        values = pd.to_numeric(series, errors='coerce').dropna()
+        return UNITColumns(
+            units=[unit],
+            unit_counts={unit: int(len(values))},
+            with_measurement=False,
+            si_unit=conversion[0],
+            statistics=magnitude_statistics(values.to_numpy(dtype='float64') * conversion[1] + conversion[2])
+        )
+    if column_overview.type not in TEXT_TYPES:
+        return False
+
+    codes, uniques = pd.factorize(series)
+    codes = codes[codes >= 0]
+    if not codes.size:
         return False
-    pattern = re.compile(r'^-?\d+\.?\d*\s*[a-zA-Z°/%]+$')
-    return bool(pattern.match(value) and value not in special_units)
+    parsed = parse_units(uniques)
+    # Rows per distinct value, so everything below is computed over the distinct values
+    counts = pd.Series(np.bincount(codes, minlength=len(uniques)))
+    if counts[parsed['recognized']].sum() / codes.size < MEASUREMENT_THRESHOLD:
+        return False
+    unit_counts = counts.groupby(parsed['unit']).sum().sort_values(ascending=False, kind='stable')
+    # Statistics only over the values whose unit converts to the most frequent SI unit
+    with_value = parsed['value'].notna()
+    si_units = counts[with_value].groupby(parsed['si_unit'][with_value]).sum().sort_values(ascending=False, kind='stable')
+    si_unit = si_units.index[0] if not si_units.empty else None
+    magnitudes = parsed['si_value'].where(parsed['si_unit'] == si_unit).to_numpy(dtype='float64')[codes]
+    return UNITColumns(
+        units=unit_counts.index.tolist(),
+        unit_counts={unit: int(count) for unit, count in unit_counts.items()},
+        with_measurement=bool((with_value & parsed['unit'].notna()).any()),
+        si_unit=si_unit,
+        statistics=magnitude_statistics(magnitudes[~np.isnan(magnitudes)])
+    )
+
+
+def magnitude_statistics(values: np.ndarray) -> Dict[str, float]:
+    if values.size == 0:
+        return {}
+    summary = numeric_summary(values)
+    m = summary.moments
+    return {
+        'count': int(m.count),
+        'min': float(m.min),
+        'max': float(m.max),
+        'mean': float(m.mean),
+        'median': float(summary.median),
+        'std': float(m.std),
+    }
@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import pyarrow as pa
+
+from utils.plot_utils import figure_html
+from ..basic.statistics import numeric_summary
+
+UPPER = np.arange(256, dtype=np.uint8)
+UPPER[ord("a"):ord("z") + 1] -= 32
+# Number of bins of the length and GC content histograms
+HISTOGRAM_BINS = 50
+
+
+@dataclass
+class SequenceBuffer:
+    # Upper case residues of all sequences back to back, sequence i is data[offsets[i]:offsets[i + 1]]
+    data: np.ndarray
+    offsets: np.ndarray
+
+    @classmethod
+    def from_series(cls, seqs: pd.Series | Iterable[str]) -> "SequenceBuffer":
+        if isinstance(seqs, pd.Series):
+            seqs = seqs.dropna()
+        return cls.from_arrow(pa.array(seqs, type=pa.large_string(), from_pandas=True))
+
+    @classmethod
+    def from_arrow(cls, array: pa.Array | pa.ChunkedArray) -> "SequenceBuffer":
+        if isinstance(array, pa.ChunkedArray):
+            array = array.combine_chunks()
+        array = array.cast(pa.large_string()).drop_null()
+        _, offsets, data = array.buffers()
+        offsets = np.frombuffer(offsets, dtype=np.int64)[array.offset:array.offset + len(array) + 1]
+        data = np.frombuffer(data, dtype=np.uint8) if data is not None else np.empty(0, dtype=np.uint8)
+        return cls(UPPER[data[offsets[0]:offsets[-1]]], offsets - offsets[0])
+
+    def __len__(self) -> int:
+        return self.offsets.size - 1
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def to_arrow(self) -> pa.LargeStringArray:
+        return pa.LargeStringArray.from_buffers(len(self), pa.py_buffer(self.offsets), pa.py_buffer(self.data))
+
+    def joined(self, separator: int = 0) -> np.ndarray:
+        # All sequences with a separator byte in between, so no window spans two sequences
+        return np.insert(self.data, self.offsets[1:-1], separator)
+
+    def count(self, letters: str) -> np.ndarray:
+        # Per sequence count of the given letters from one cumulative sum over the buffer
+        mask = np.zeros(256, dtype=bool)
+        mask[np.frombuffer(letters.upper().encode("ascii"), dtype=np.uint8)] = True
+        total = np.concatenate([[0], np.cumsum(mask[self.data], dtype=np.int64)])
+        return total[self.offsets[1:]] - total[self.offsets[:-1]]
+
+    def composition(self) -> Dict[str, int]:
+        counts = np.bincount(self.data, minlength=256)
+        return {chr(code): int(counts[code]) for code in np.flatnonzero(counts)}
+
+    def unique(self) -> tuple["SequenceBuffer", np.ndarray]:
+        counts = self.to_arrow().value_counts()
+        return SequenceBuffer.from_arrow(counts.field("values")), counts.field("counts").to_numpy()
+
+    def value_counts(self) -> pd.Series:
+        counts = self.to_arrow().value_counts()
+        return pd.Series(counts.field("counts").to_numpy(), index=counts.field("values").to_pylist(), dtype="int64")
+
+
+@dataclass
+class DistributionSummary:
+    min: float
+    max: float
+    mean: float
+    median: float
+    std: float
+    quantiles: list[float]
+
+
+@dataclass
+class SequenceStats:
+    sequences: int
+    residues: int
+    length: DistributionSummary
+    n50: int
+    composition: Dict[str, int]
+    gc_content: DistributionSummary | None
+    length_plot: str | None
+    gc_plot: str | None
+
+
+def distribution_summary(values: np.ndarray) -> DistributionSummary:
+    summary = numeric_summary(values.astype("float64"), (0.05, 0.25, 0.75, 0.95))
+    m = summary.moments
+    return DistributionSummary(
+        min=round(m.min, 2),
+        max=round(m.max, 2),
+        mean=round(m.mean, 2),
+        median=round(summary.median, 2),
+        std=round(m.std, 2),
+        quantiles=np.round(summary.quantiles, 2).tolist()
+    )
+
+
+def n50(lengths: np.ndarray) -> int:
+    ordered = np.sort(lengths)[::-1]
+    covered = np.cumsum(ordered)
+    return int(ordered[np.searchsorted(covered, covered[-1] / 2)]) if ordered.size else 0
+
+
+def sequence_statistics(buffer: SequenceBuffer, gc: bool = False) -> SequenceStats | None:
+    if len(buffer) == 0:
+        return None
+    lengths = buffer.lengths
+    gc_content = None
+    if gc:
+        gc_content = np.divide(buffer.count("GC") * 100, lengths, out=np.zeros(lengths.size), where=lengths > 0)
+
+    return SequenceStats(
+        sequences=len(buffer),
+        residues=int(buffer.data.size),
+        length=distribution_summary(lengths),
+        n50=n50(lengths),
+        composition=dict(sorted(buffer.composition().items(), key=lambda item: item[1], reverse=True)),
+        gc_content=distribution_summary(gc_content) if gc else None,
+        length_plot=histogram_plot(lengths, "Length"),
+        gc_plot=histogram_plot(gc_content, "GC content (%)") if gc else None
+    )
+
+
+def histogram_plot(values: np.ndarray, title: str) -> str | None:
+    # Binned before plotting, so the figure size does not grow with the number of sequences
+    if values.size == 0:
+        return None
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    fig = px.bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, color_discrete_sequence=['#0F65A0'])
+    fig.update_layout(bargap=0.05, plot_bgcolor='white', xaxis_title=title, yaxis_title='Sequences')
+    fig.update_xaxes(mirror=True, ticks='outside', showline=True, linecolor='black', gridcolor='lightgrey')
+    fig.update_yaxes(mirror=True, ticks='outside', showline=True, linecolor='black', gridcolor='lightgrey')
+    return figure_html(fig)
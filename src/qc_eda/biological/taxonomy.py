@@ -1,5 +1,11 @@
 from dataclasses import dataclass
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+
+from qc_eda.basic.schema import ColumnSchema
+from qc_eda.basic.taxonomy_validator import FLAG_NAMES, validate_buffer
+from utils.taxonomy_index import TaxonomyIndex
 
 @dataclass
 class TaxonomyFlags:
@@ -7,12 +13,14 @@ class TaxonomyFlags:
     is_taxonomy: bool
     taxid: set | str | None
     taxonomy: list | str | None
+    # Rows per name quality flag of a column of organism names
+    name_flags: dict[str, int] | None = None
 
 
-def taxonomy_flags(df, col, tax_df) -> TaxonomyFlags:
-
-    if df[col].dtype in ['int64', 'float64'] or pd.api.types.is_numeric_dtype(df[col]):
-        taxid_result = is_taxid(df[col], tax_df)
+def taxonomy_flags(df, col, tax_index: TaxonomyIndex, column: ColumnSchema | None = None) -> TaxonomyFlags:
+    numeric = column.numeric if column is not None else pd.api.types.is_numeric_dtype(df[col])
+    if numeric:
+        taxid_result = is_taxid(df[col], tax_index)
         if taxid_result is not None:
             return TaxonomyFlags(
                 name=col,
@@ -21,13 +29,14 @@ def taxonomy_flags(df, col, tax_df) -> TaxonomyFlags:
                 taxonomy=None
             )
     else:
-        taxonomy_result = is_taxonomy(df[col], tax_df)
+        taxonomy_result = is_taxonomy(df[col], tax_index)
         if taxonomy_result is not None:
             return TaxonomyFlags(
                 name=col,
                 is_taxonomy=True,
                 taxid=None,
-                taxonomy=taxonomy_result
+                taxonomy=taxonomy_result,
+                name_flags=name_flags(df[col])
             )
 
     return TaxonomyFlags(
@@ -38,8 +47,24 @@ def taxonomy_flags(df, col, tax_df) -> TaxonomyFlags:
     )
 
 
-def is_taxid(col: pd.Series, tax_df: pd.DataFrame, threshold: float = 0.9) -> set | str | None:
-    valid_tax_ids = set(tax_df['tax_id'])
+def validate_names(col: pd.Series) -> np.ndarray:
+    # Flag bits of taxonomy_validator per row, each distinct name is checked once on the Arrow string buffer
+    codes, uniques = pd.factorize(col)
+    array = pa.array(pd.Series(uniques, dtype=object).astype(str), type=pa.large_string())
+    _, offsets, data = array.buffers()
+    offsets = np.frombuffer(offsets, dtype=np.int64)[array.offset:array.offset + len(array) + 1]
+    data = np.frombuffer(data, dtype=np.uint8) if data is not None else np.zeros(0, dtype=np.uint8)
+    flags = validate_buffer(data, np.ascontiguousarray(offsets))
+    # Missing values have code -1 and pick the appended 0
+    return np.append(flags, np.uint8(0))[codes]
+
+
+def name_flags(col: pd.Series) -> dict[str, int]:
+    flags = validate_names(col)
+    return {name: int(np.count_nonzero(flags & bit)) for bit, name in FLAG_NAMES.items()}
+
+
+def is_taxid(col: pd.Series, tax_index: TaxonomyIndex, threshold: float = 0.9) -> set | str | None:
     excluded_cols = ["length", "start", "end"]
 
     if col.name and str(col.name).lower() in excluded_cols:
@@ -49,7 +74,10 @@ def is_taxid(col: pd.Series, tax_df: pd.DataFrame, threshold: float = 0.9) -> se
     is_numeric_candidate = tmp_series.notna().sum() / len(col) > threshold
 
     if is_numeric_candidate:
-        is_valid = tmp_series.isin(valid_tax_ids)
+        # Binary search in the sorted tax IDs of the index, values that are not whole numbers are never valid
+        whole = tmp_series.notna() & (tmp_series % 1 == 0)
+        is_valid = pd.Series(False, index=col.index)
+        is_valid[whole] = tax_index.has_ids(tmp_series[whole].to_numpy(dtype="int64"))
         validity_rate = is_valid.sum() / len(col)
 
         if validity_rate > threshold:
@@ -64,13 +92,16 @@ def is_taxid(col: pd.Series, tax_df: pd.DataFrame, threshold: float = 0.9) -> se
     return None
 
 
-def is_taxonomy(col: pd.Series, tax_df: pd.DataFrame, threshold: float = 0.8) -> list | str | None:
-    valid_names = set(tax_df['name_txt'])
-    is_valid = col.isin(valid_names)
+def is_taxonomy(col: pd.Series, tax_index: TaxonomyIndex, threshold: float = 0.8) -> list | str | None:
+    # Names are compared without case and extra whitespace, each distinct value is probed once.
+    # Missing values have code -1 and pick the appended False.
+    codes, uniques = pd.factorize(col)
+    uniques = pd.Series(uniques, dtype=object)
+    is_valid = pd.Series(np.append(tax_index.has_names(uniques), False)[codes], index=col.index)
     validity_rate = is_valid.sum() / len(col)
     if validity_rate < threshold:
-        cleaned_names = col.astype(str).str.extract(r'^([^(]+)')[0].str.strip()
-        is_valid_cleaned = cleaned_names.isin(valid_names)
+        cleaned_names = uniques.astype(str).str.extract(r'^([^(]+)')[0].str.strip()
+        is_valid_cleaned = pd.Series(np.append(tax_index.has_names(cleaned_names), False)[codes], index=col.index)
         validity_rate_cleaned = is_valid_cleaned.sum() / len(col)
 
         if validity_rate_cleaned > validity_rate:
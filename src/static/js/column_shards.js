@@ -0,0 +1,186 @@
+// Column report for wide tables: the page only loads the column index from columns/index.js,
+// the cards of the current page are loaded from columns/<index>.js when they are shown.
+// Script tags are used instead of fetch, so the report also works when opened from the file system.
+(function () {
+    const itemsPerPage = 20;
+    const columns = window.COLUMN_INDEX || [];
+    const cards = {};
+    const waiting = {};
+    let matches = columns.map((_, index) => index);
+    let currentPage = 1;
+
+    window.columnLoaded = function (index, html) {
+        cards[index] = html;
+        (waiting[index] || []).forEach(resolve => resolve(html));
+        delete waiting[index];
+    };
+
+    function loadColumn(index) {
+        if (cards[index] !== undefined) {
+            return Promise.resolve(cards[index]);
+        }
+        return new Promise(resolve => {
+            if (!waiting[index]) {
+                waiting[index] = [];
+                const script = document.createElement('script');
+                script.src = `columns/${index}.js`;
+                script.onload = () => script.remove();
+                document.body.appendChild(script);
+            }
+            waiting[index].push(resolve);
+        });
+    }
+
+    function totalPages() {
+        return Math.max(1, Math.ceil(matches.length / itemsPerPage));
+    }
+
+    function showPage() {
+        const container = document.getElementById('columns-container');
+        const start = (currentPage - 1) * itemsPerPage;
+        const page = matches.slice(start, start + itemsPerPage);
+        container.innerHTML = '';
+        const loaded = page.map(index => {
+            const slot = document.createElement('div');
+            slot.className = 'column-slot';
+            slot.dataset.index = index;
+            slot.innerHTML = `<div class="card row mt-3"><div class="card-header text-muted">${escapeHtml(columns[index].title)}</div></div>`;
+            container.appendChild(slot);
+            return loadColumn(index).then(html => {
+                if (slot.isConnected) {
+                    slot.innerHTML = html;
+                    window.observePlots(slot);
+                }
+            });
+        });
+
+        document.getElementById('current-range').textContent =
+            page.length ? `${start + 1}-${start + page.length}` : '0-0';
+        document.getElementById('match-count').textContent = matches.length;
+        document.getElementById('current-page-info').textContent = currentPage;
+        document.getElementById('page-count').textContent = totalPages();
+        generatePagination();
+        return Promise.all(loaded);
+    }
+
+    function goTo(page) {
+        if (page >= 1 && page <= totalPages() && page !== currentPage) {
+            currentPage = page;
+            showPage();
+            document.getElementById('columns-container').scrollIntoView({behavior: 'smooth'});
+        }
+    }
+
+    function pageItem(label, page, state, title) {
+        const li = document.createElement('li');
+        li.className = `page-item ${state}`;
+        li.innerHTML = `<a class="page-link" href="#" data-page="${page}" title="${title}">${label}</a>`;
+        return li;
+    }
+
+    function generatePagination() {
+        const pages = totalPages();
+        let startPage = Math.max(1, currentPage - 2);
+        const endPage = Math.min(pages, startPage + 4);
+        startPage = Math.max(1, endPage - 4);
+
+        ['column-pagination', 'column-pagination-bottom'].forEach(id => {
+            const pagination = document.getElementById(id);
+            pagination.innerHTML = '';
+            pagination.appendChild(pageItem('≪', 1, currentPage === 1 ? 'disabled' : '', 'First Page'));
+            pagination.appendChild(pageItem('&lt;', currentPage - 1, currentPage === 1 ? 'disabled' : '', 'Previous Page'));
+            for (let i = startPage; i <= endPage; i++) {
+                pagination.appendChild(pageItem(i, i, i === currentPage ? 'active' : '', `Page ${i}`));
+            }
+            pagination.appendChild(pageItem('&gt;', currentPage + 1, currentPage === pages ? 'disabled' : '', 'Next Page'));
+            pagination.appendChild(pageItem('≫', pages, currentPage === pages ? 'disabled' : '', 'Last Page'));
+        });
+    }
+
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
+    function search(query) {
+        query = query.trim().toLowerCase();
+        matches = columns.map((_, index) => index).filter(index => !query ||
+            columns[index].name.toLowerCase().includes(query) || columns[index].type.toLowerCase().includes(query));
+        currentPage = 1;
+        showPage();
+    }
+
+    // Correlation links may point to a column on another page or outside the current search
+    function openColumn(anchor) {
+        const index = columns.findIndex(column => column.anchor === anchor);
+        if (index === -1) {
+            return;
+        }
+        let position = matches.indexOf(index);
+        if (position === -1) {
+            document.getElementById('column-search').value = '';
+            matches = columns.map((_, i) => i);
+            position = index;
+        }
+        currentPage = Math.floor(position / itemsPerPage) + 1;
+        showPage().then(() => {
+            const target = document.getElementById(anchor);
+            if (target) {
+                bootstrap.Collapse.getOrCreateInstance(target).show();
+                setTimeout(() => target.scrollIntoView({behavior: 'smooth', block: 'start'}), 300);
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        showPage();
+
+        ['column-pagination', 'column-pagination-bottom'].forEach(id => {
+            document.getElementById(id).addEventListener('click', function (e) {
+                e.preventDefault();
+                const page = parseInt(e.target.dataset.page);
+                if (page) {
+                    goTo(page);
+                }
+            });
+        });
+
+        let timer = null;
+        document.getElementById('column-search').addEventListener('input', function (e) {
+            clearTimeout(timer);
+            timer = setTimeout(() => search(e.target.value), 150);
+        });
+
+        document.addEventListener('keydown', function (e) {
+            const tag = e.target.tagName.toLowerCase();
+            if (tag === 'input' || tag === 'textarea') {
+                return;
+            }
+            if (e.key === 'ArrowLeft') {
+                goTo(currentPage - 1);
+            } else if (e.key === 'ArrowRight') {
+                goTo(currentPage + 1);
+            }
+        });
+
+        document.addEventListener('click', function (e) {
+            if (e.target.matches('a.cb-pink-link')) {
+                e.preventDefault();
+                openColumn(e.target.getAttribute('href').substring(1));
+            }
+        });
+
+        document.getElementById('collapseAllBtn').addEventListener('click', () => {
+            document.querySelectorAll('#columns-container .multi-collapse').forEach(el => {
+                bootstrap.Collapse.getOrCreateInstance(el).hide();
+            });
+        });
+
+        document.getElementById('expandAllBtn').addEventListener('click', () => {
+            document.querySelectorAll('#columns-container .multi-collapse').forEach(el => {
+                bootstrap.Collapse.getOrCreateInstance(el).show();
+            });
+        });
+    });
+})();
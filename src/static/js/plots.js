@@ -0,0 +1,39 @@
+// Figures are embedded as JSON and drawn with Plotly once their container scrolls into view
+(function () {
+    function render(container) {
+        const source = container.querySelector('script[type="application/json"]');
+        if (!source || typeof Plotly === 'undefined') {
+            return;
+        }
+        const figure = JSON.parse(source.textContent);
+        source.remove();
+        if (!figure.layout.template && window.PLOT_TEMPLATE) {
+            figure.layout.template = window.PLOT_TEMPLATE;
+        }
+        Plotly.newPlot(container, figure.data, figure.layout, {responsive: true});
+    }
+
+    const observer = 'IntersectionObserver' in window ? new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (entry.isIntersecting) {
+                observer.unobserve(entry.target);
+                render(entry.target);
+            }
+        });
+    }, {rootMargin: '200px'}) : null;
+
+    // Also called for column cards that are inserted after the page has loaded
+    window.observePlots = function (root) {
+        root.querySelectorAll('.lazy-plot').forEach(function (container) {
+            if (observer) {
+                observer.observe(container);
+            } else {
+                render(container);
+            }
+        });
+    };
+
+    document.addEventListener('DOMContentLoaded', function () {
+        window.observePlots(document);
+    });
+})();
@@ -0,0 +1,44 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "bioprofilekit"
+
+
+@dataclass
+class CacheSettings:
+    directory: Path
+    offline: bool
+
+
+settings = CacheSettings(
+    directory=Path(os.environ.get("BIOPROFILEKIT_CACHE", DEFAULT_CACHE_DIR)).expanduser(),
+    offline=False
+)
+
+
+def configure(directory: str | os.PathLike | None = None, offline: bool = False) -> CacheSettings:
+    if directory is not None:
+        settings.directory = Path(directory).expanduser()
+    settings.offline = offline
+    return settings
+
+
+def cache_path(*parts: str) -> Path:
+    path = settings.directory.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def write_frame(df: pd.DataFrame, path: Path) -> Path:
+    # Write to a sibling file first, so concurrent runs never see a half written table
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_frame(path: Path) -> pd.DataFrame:
+    return pd.read_parquet(path)
@@ -1,6 +1,10 @@
+import csv
+import hashlib
 import io
-import pathlib
+import shutil
+import tempfile
 import zipfile
+from datetime import datetime, timedelta
 from pathlib import Path
 
 import pandas as pd
@@ -8,9 +12,45 @@ import requests
 from goatools.base import download_go_basic_obo
 from goatools.obo_parser import GODag
 
-def get_gene_ontology():
-    obo_path = download_go_basic_obo()
-    go_dag = GODag(obo_path)
+from utils.cache import cache_path, read_frame, settings, write_frame
+from utils.taxonomy_index import INDEX_VERSION, TaxonomyIndex, build_taxonomy_index
+
+COG_URL = "https://ftp.ncbi.nlm.nih.gov/pub/COG/COG2024/data/cog-24.def.tab"
+VOCABULARY_MAX_AGE = timedelta(days=30)
+
+
+def get_gene_ontology(max_age: timedelta = VOCABULARY_MAX_AGE) -> pd.DataFrame:
+    return _cached_vocabulary("go", _download_gene_ontology, max_age)
+
+
+def get_clusters_of_orthologous_groups(max_age: timedelta = VOCABULARY_MAX_AGE) -> pd.DataFrame:
+    return _cached_vocabulary("cog", _download_clusters_of_orthologous_groups, max_age)
+
+
+def _cached_vocabulary(name: str, download, max_age: timedelta) -> pd.DataFrame:
+    path = cache_path("annotation") / f"{name}.parquet"
+    if path.is_file():
+        age = datetime.now() - datetime.fromtimestamp(path.stat().st_mtime)
+        if settings.offline or age < max_age:
+            return _with_checksum(read_frame(path), _file_checksum(path))
+    elif settings.offline:
+        raise FileNotFoundError(f"No cached {name.upper()} vocabulary in {path.parent}, run 'bioprofilekit refresh' while online")
+
+    df = download()
+    write_frame(df, path)
+    return _with_checksum(df, _file_checksum(path))
+
+
+def _file_checksum(path: Path) -> str:
+    # Vocabularies come without a published checksum, so the stored file identifies the version
+    with open(path, "rb") as fh:
+        return hashlib.file_digest(fh, "md5").hexdigest()
+
+
+def _download_gene_ontology() -> pd.DataFrame:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        obo_path = download_go_basic_obo(str(Path(tmp_dir) / "go-basic.obo"))
+        go_dag = GODag(obo_path)
     print(go_dag.version)
     data = list()
     for go_id in go_dag.keys():
@@ -18,46 +58,146 @@ def get_gene_ontology():
         namespace = getattr(term, "namespace", "")
         data.append([go_id, term.name, namespace])
 
-    df = pd.DataFrame(data, columns=["GO_ID", "Name", "Namespace"])
-    if Path(obo_path).is_file():
-        pathlib.Path(obo_path).unlink(missing_ok=True)
-        print(f"Removed {obo_path}")
-    return df
+    return pd.DataFrame(data, columns=["GO_ID", "Name", "Namespace"])
 
 
-def get_clusters_of_orthologous_groups():
-    url: str = "https://ftp.ncbi.nlm.nih.gov/pub/COG/COG2024/data/cog-24.def.tab"
+def _download_clusters_of_orthologous_groups() -> pd.DataFrame:
     fields = ["COG_ID", "Functional Category", "COG name"]
-    response = requests.get(url)
+    response = requests.get(COG_URL, timeout=60)
+    response.raise_for_status()
+    return pd.read_csv(io.StringIO(response.text), sep="\t", skipinitialspace=True, usecols=[0, 1, 2], names=fields)
+
+
+TAXDUMP_URL = "https://ftp.ncbi.nih.gov/pub/taxonomy/taxdmp.zip"
+NAMES_COLUMNS = ["tax_id", "name_txt", "unique_name", "name_class"]
+NODES_COLUMNS = ["tax_id", "parent_tax_id", "rank"]
+
+
+def get_tax_ids(refresh: bool = False) -> pd.DataFrame:
+    checksum = _taxonomy_checksum(refresh)
+    return _with_checksum(read_frame(cache_path("taxonomy") / f"names-{checksum}.parquet"), checksum)
 
-    if response.status_code == 200:
-        df = pd.read_csv(io.StringIO(response.text), sep="\t", skipinitialspace=True, usecols=[0, 1, 2], names=fields)
-    else:
-        print(f"Error: {response.status_code}")
+
+def get_taxonomy_index(refresh: bool = False) -> TaxonomyIndex:
+    # Built from the cached dump once per dump version, later runs only memory-map the arrays
+    checksum = _taxonomy_checksum(refresh)
+    tax_dir = cache_path("taxonomy")
+    index_dir = tax_dir / f"index-v{INDEX_VERSION}-{checksum}"
+    if not (index_dir / "meta.json").is_file() or refresh:
+        print(f"Building taxonomy index in {index_dir} ...")
+        nodes_path = tax_dir / f"nodes-{checksum}.parquet"
+        build_taxonomy_index(read_frame(tax_dir / f"names-{checksum}.parquet"),
+                             read_frame(nodes_path) if nodes_path.is_file() else None, index_dir, checksum)
+        for old in tax_dir.glob("index-*"):
+            if old != index_dir and old.is_dir() and not old.name.endswith(".tmp"):
+                shutil.rmtree(old, ignore_errors=True)
+    return TaxonomyIndex(index_dir)
+
+
+def _taxonomy_checksum(refresh: bool = False) -> str:
+    # Checksum of the taxonomy dump in the cache, downloaded first when NCBI has a newer one
+    tax_dir = cache_path("taxonomy")
+    current = tax_dir / "current"
+
+    if settings.offline:
+        if not current.is_file():
+            raise FileNotFoundError(f"No cached taxonomy dump in {tax_dir}, run 'bioprofilekit refresh' while online")
+        return current.read_text().strip()
+
+    try:
+        checksum = _remote_checksum(f"{TAXDUMP_URL}.md5")
+    except requests.RequestException as err:
+        if current.is_file():
+            print(f"Could not reach NCBI ({err}), using cached taxonomy dump")
+            return current.read_text().strip()
+        raise
+
+    names_path = tax_dir / f"names-{checksum}.parquet"
+    nodes_path = tax_dir / f"nodes-{checksum}.parquet"
+    if names_path.is_file() and nodes_path.is_file() and not refresh:
+        current.write_text(checksum)
+        return checksum
+
+    names, nodes = _download_taxdump(TAXDUMP_URL, checksum, tax_dir)
+    write_frame(names, names_path)
+    write_frame(nodes, nodes_path)
+    current.write_text(checksum)
+    for old in [*tax_dir.glob("names-*.parquet"), *tax_dir.glob("nodes-*.parquet")]:
+        if old not in (names_path, nodes_path):
+            old.unlink(missing_ok=True)
+    return checksum
+
+
+def _with_checksum(df: pd.DataFrame, checksum: str) -> pd.DataFrame:
+    # Identifies the dump version, e.g. in the keys of cached column results
+    df.attrs["checksum"] = checksum
     return df
 
 
-def get_tax_ids():
-    url = "https://ftp.ncbi.nih.gov/pub/taxonomy/taxdmp.zip"
+def _remote_checksum(url: str) -> str:
+    resp = requests.get(url, timeout=30)
+    resp.raise_for_status()
+    return resp.text.split()[0].strip()
+
 
+def _download_taxdump(url: str, checksum: str, target_dir: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
     print(f"Downloading {url} ...")
-    resp = requests.get(url, stream=True)
-    resp.raise_for_status()
+    md5 = hashlib.md5()
+    with tempfile.TemporaryFile(dir=target_dir) as tmp_file:
+        with requests.get(url, stream=True, timeout=60) as resp:
+            resp.raise_for_status()
+            for chunk in resp.iter_content(chunk_size=1 << 20):
+                md5.update(chunk)
+                tmp_file.write(chunk)
+        if md5.hexdigest() != checksum:
+            raise ValueError(f"Checksum mismatch for {url}: expected {checksum}, got {md5.hexdigest()}")
 
-    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
-        print("Files inside ZIP:", zf.namelist())
-
-        with zf.open("names.dmp") as fh:
-            print(fh)
-            df = pd.read_csv(
-                fh,
-                sep="|",
-                header=None,
-                index_col=False,
-                names=["tax_id", "name_txt", "unique_name", "name_class"],
-                engine="c"
-            )
-    df = df.map(lambda x: x.strip() if isinstance(x, str) else x)
+        tmp_file.seek(0)
+        with zipfile.ZipFile(tmp_file) as zf:
+            with zf.open("names.dmp") as fh:
+                names = parse_names_dmp(fh)
+            with zf.open("nodes.dmp") as fh:
+                nodes = parse_nodes_dmp(fh)
+    return names, nodes
+
+
+def parse_names_dmp(fh) -> pd.DataFrame:
+    df = pd.read_csv(
+        fh,
+        sep="|",
+        header=None,
+        index_col=False,
+        usecols=range(len(NAMES_COLUMNS)),
+        names=NAMES_COLUMNS,
+        dtype=str,
+        quoting=csv.QUOTE_NONE,
+        keep_default_na=False,
+        engine="c"
+    )
+    for col in NAMES_COLUMNS:
+        df[col] = df[col].str.strip()
+    df["tax_id"] = df["tax_id"].astype("int64")
+    df["name_class"] = df["name_class"].astype("category")
     #df = df[df["name_class"] == "scientific name"]
     return df
 
+
+def parse_nodes_dmp(fh) -> pd.DataFrame:
+    df = pd.read_csv(
+        fh,
+        sep="|",
+        header=None,
+        index_col=False,
+        usecols=range(len(NODES_COLUMNS)),
+        names=NODES_COLUMNS,
+        dtype=str,
+        quoting=csv.QUOTE_NONE,
+        keep_default_na=False,
+        engine="c"
+    )
+    for col in NODES_COLUMNS:
+        df[col] = df[col].str.strip()
+    df["tax_id"] = df["tax_id"].astype("int64")
+    df["parent_tax_id"] = df["parent_tax_id"].astype("int64")
+    df["rank"] = df["rank"].astype("category")
+    return df
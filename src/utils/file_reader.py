@@ -2,50 +2,356 @@
 
 import pandas as pd
 import pathlib
-from functools import reduce
+import time
+import codecs
+import json
+from typing import Any, Iterator
 import csv
+import re
 import click
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 
-def read_file(file: click.Path) -> pd.DataFrame | None:
-    file = pathlib.Path(file).absolute()
-    ext = pathlib.Path(file.__str__()).suffix
+STREAM_BLOCK_SIZE = 16 << 20
+# Bytes of the decompressed file the dialect and header are guessed from
+SNIFF_BYTES = 64 << 10
+COMPRESSIONS = {".gz": "gzip", ".bz2": "bz2", ".zst": "zstd"}
+JSON_LINES_EXTENSIONS = (".jsonl", ".ndjson")
+TABLE_EXTENSIONS = (".csv", ".tsv", ".json") + JSON_LINES_EXTENSIONS
+# Decompressed bytes the JSON reader decodes at once, and records per Arrow table when a whole file is read
+JSON_CHUNK_SIZE = 1 << 20
+JSON_BATCH_SIZE = 100_000
+JSON_WHITESPACE = " \t\n\r"
+# Column number in the errors of the Arrow CSV reader when a value does not fit the type of its column
+CONVERSION_ERROR = re.compile(r"In CSV column #(\d+): .*CSV conversion error")
+
+
+class ColumnTypesChanged(ValueError):
+    # A column turned out to be text after earlier batches were already read as another type
+    def __init__(self, file: pathlib.Path, types: dict[str, str]):
+        super().__init__(f"Text found after the first rows in column {', '.join(types)} of {file.name}")
+        self.types = types
+
+
+def compression(file: pathlib.Path) -> str | None:
+    return COMPRESSIONS.get(file.suffix.lower())
+
+
+def table_extension(file: pathlib.Path) -> str:
+    # Extension of the table itself, e.g. .csv for data.csv.gz
+    suffixes = file.suffixes[:-1] if compression(file) else file.suffixes
+    return suffixes[-1].lower() if suffixes else ""
+
+
+def open_input(file: pathlib.Path) -> pa.NativeFile:
+    # Compressed files are decompressed while they are read, never as a whole
+    return pa.input_stream(file.__str__(), compression=compression(file))
+
+
+def sniff(file: pathlib.Path) -> tuple[str, bool]:
+    with open_input(file) as stream:
+        text = stream.read(SNIFF_BYTES).decode("utf-8", errors="replace")
+    lines = text.splitlines(keepends=True)
+    # The last line may be cut off, unless the whole file fit into the sample
+    sample = "".join(lines[:10] if len(lines) > 10 or len(text) < SNIFF_BYTES else lines[:-1])
+    dialect = csv.Sniffer().sniff(sample)
+    header = csv.Sniffer().has_header(sample)
+    return dialect.delimiter, header
+
+
+def arrow_types(dtypes: dict[str, str] | None) -> dict[str, pa.DataType]:
+    # Type names as accepted by pyarrow, e.g. string, int64, float64, bool, date32, plus category
+    types = {}
+    for col, name in (dtypes or {}).items():
+        if name == "category":
+            types[col] = pa.dictionary(pa.int32(), pa.string())
+            continue
+        try:
+            types[col] = pa.type_for_alias(name)
+        except ValueError:
+            raise ValueError(f'Unknown type {name} for column {col}') from None
+    return types
 
 
-    with open(file, encoding="utf-8") as csv_file:
-        csv_bytes = "".join(csv_file.readline() for _ in range(10))
-        dialect = csv.Sniffer().sniff(csv_bytes)
-        header = csv.Sniffer().has_header(csv_bytes)
-        csv_file.seek(0)
+def arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    # Text stays in Arrow buffers as string[pyarrow], numbers and booleans become NumPy columns as before
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow"),
+                                         pa.large_string(): pd.StringDtype("pyarrow")}.get)
 
-    head_col = 0 if header else None
-    idx_col = 0 if header else None
 
-    if not ext in (".csv", ".tsv", ".json"):
-        raise ValueError(f'File {file} is not a .csv or .tsv file')
+def convert_options(usecols: list[str] | None, types: dict[str, pa.DataType]) -> pa_csv.ConvertOptions:
+    # Empty and NA cells are missing in text columns too, as they were when pandas read the file
+    return pa_csv.ConvertOptions(include_columns=usecols, column_types=types, strings_can_be_null=True,
+                                 quoted_strings_can_be_null=True)
 
+
+def column_names(file: pathlib.Path, delimiter: str, header: bool) -> list[str]:
+    # Names from the header line, or Unknown_<i> for files without a header
+    with open_input(file) as stream:
+        line = stream.read(SNIFF_BYTES).decode("utf-8", errors="replace").splitlines()[0]
+    names = next(csv.reader([line], delimiter=delimiter))
+    return names if header else [f"Unknown_{i}" for i in range(len(names))]
+
+
+def read_file(file: click.Path, usecols: list[str] | None = None, dtypes: dict[str, str] | None = None) -> pd.DataFrame | None:
+    file = pathlib.Path(file).absolute()
+    ext = table_extension(file)
+
+    if not ext in TABLE_EXTENSIONS:
+        raise ValueError(f'File {file} is not a .csv, .tsv, .json or .jsonl file')
+
+    start = time.perf_counter()
     if ext == ".csv" or ext == ".tsv":
-        df = pd.read_csv(file.__str__(), header=head_col, index_col=idx_col, sep=dialect.delimiter, engine="pyarrow")
-        if head_col is None:
-            df = df.add_prefix("Unknown_")
-        if df.index.name is not None and len(df.index.name) > 0:
-            df = df.reset_index()
-        return df
-
-    elif ext == ".json":
-        df = pd.read_json(file.__str__(), orient='values')
-        cols = [i for i in df.columns if isinstance(df[i][0], dict)]
-        if not cols:
-            df = df.T
-            cols = [i for i in df.columns if isinstance(df[i][0], dict)]
-            if not cols:
-                return df
-            else:
-                data_frames = list()
-                for i in cols:
-                    tmp = pd.json_normalize(df[i])
-                    data_frames.append(tmp)
-                df = reduce(lambda left, right: pd.merge(left, right, left_index=True, right_index=True), data_frames)
-        return df
-
-    return None
+        df = read_csv(file, usecols, dtypes)
+    else:
+        df = read_json(file, usecols, dtypes)
+
+    seconds = max(time.perf_counter() - start, 1e-9)
+    size = file.stat().st_size / 2 ** 20
+    print(f"Read {len(df)} rows and {len(df.columns)} columns from {size:.1f} MiB in {seconds:.2f} s "
+          f"({size / seconds:.1f} MiB/s, {len(df) / seconds:,.0f} rows/s)")
+    return df
+
+
+def read_csv(file: pathlib.Path, usecols: list[str] | None = None, dtypes: dict[str, str] | None = None) -> pd.DataFrame:
+    delimiter, header = sniff(file)
+    read_options = pa_csv.ReadOptions(block_size=STREAM_BLOCK_SIZE)
+    if not header:
+        read_options.column_names = column_names(file, delimiter, header)
+    with open_input(file) as stream:
+        table = pa_csv.read_csv(stream, read_options=read_options,
+                                convert_options=convert_options(usecols, arrow_types(dtypes)),
+                                parse_options=pa_csv.ParseOptions(delimiter=delimiter))
+    df = arrow_to_pandas(table)
+    # A first column without a header, like a saved pandas index, is the index of the table
+    if header and len(df.columns) and df.columns[0] == "":
+        df = df.set_index("")
+        df.index.name = None
+    return df
+
+
+def read_json(file: pathlib.Path, usecols: list[str] | None = None, dtypes: dict[str, str] | None = None) -> pd.DataFrame:
+    # Only one batch of records is held as Python objects, the Arrow tables are concatenated once at the end
+    tables = list(iter_json_tables(file, JSON_BATCH_SIZE, usecols, dtypes))
+    if not tables:
+        return pd.DataFrame(columns=usecols)
+    return arrow_to_pandas(unify_tables(tables))
+
+
+def iter_json_values(file: pathlib.Path, start: int = 0) -> Iterator[Any]:
+    # Elements of a top level array, values of a top level object of records, or the lines of a JSON Lines file,
+    # parsed one at a time while the file is decompressed and decoded in chunks. start skips the first bytes
+    # of a JSON Lines file and must be the start of a line.
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    state = {"text": "", "pos": 0, "eof": False}
+    json_lines = table_extension(file) in JSON_LINES_EXTENSIONS
+
+    with open_input(file) as stream:
+        if start:
+            stream.seek(start)
+
+        def fill() -> bool:
+            if state["eof"]:
+                return False
+            chunk = stream.read(JSON_CHUNK_SIZE)
+            state["eof"] = not chunk
+            state["text"] = state["text"][state["pos"]:] + utf8.decode(chunk, final=state["eof"])
+            state["pos"] = 0
+            return True
+
+        def peek() -> str:
+            # Next character that is not whitespace, empty at the end of the file
+            while True:
+                text, pos = state["text"], state["pos"]
+                while pos < len(text) and text[pos] in JSON_WHITESPACE:
+                    pos += 1
+                state["pos"] = pos
+                if pos < len(text):
+                    return text[pos]
+                if not fill():
+                    return ""
+
+        def value() -> Any:
+            peek()
+            while True:
+                try:
+                    result, end = decoder.raw_decode(state["text"], state["pos"])
+                except json.JSONDecodeError:
+                    if not fill():
+                        raise
+                    continue
+                # A number at the end of the decoded text may continue in the next chunk
+                if end == len(state["text"]) and fill():
+                    continue
+                state["pos"] = end
+                return result
+
+        def skip(char: str) -> bool:
+            if peek() == char:
+                state["pos"] += 1
+                return True
+            return False
+
+        def first_line_is_record() -> bool:
+            # A .json file that starts with one complete object per line is read as JSON Lines
+            while "\n" not in state["text"][state["pos"]:] and fill():
+                pass
+            line, _, rest = state["text"][state["pos"]:].partition("\n")
+            try:
+                return isinstance(json.loads(line), dict) and rest.strip() != ""
+            except json.JSONDecodeError:
+                return False
+
+        first = peek()
+        if first == "[" and not json_lines:
+            skip("[")
+            while peek() not in ("]", ""):
+                yield value()
+                skip(",")
+        elif first == "{" and not json_lines and not first_line_is_record():
+            # Object of records, the keys are dropped like the index of pandas.json_normalize
+            skip("{")
+            while peek() not in ("}", ""):
+                value()
+                if not skip(":"):
+                    raise ValueError(f"Invalid JSON in {file.name}: expected ':' after an object key")
+                yield value()
+                skip(",")
+        else:
+            while peek():
+                yield value()
+
+
+def flatten_record(record: Any, prefix: str = "", flat: dict | None = None) -> dict:
+    # Nested objects become columns named parent.child like pandas.json_normalize, lists are kept as JSON text
+    flat = {} if flat is None else flat
+    if not isinstance(record, dict):
+        record = {f"Unknown_{i}": item for i, item in enumerate(record)} if isinstance(record, list) else {"value": record}
+    for key, item in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(item, dict) and item:
+            flatten_record(item, f"{name}.", flat)
+        elif isinstance(item, (list, dict)):
+            flat[name] = json.dumps(item)
+        else:
+            flat[name] = item
+    return flat
+
+
+def records_table(records: list[dict], usecols: list[str] | None = None) -> pa.Table:
+    names = usecols if usecols is not None else list(dict.fromkeys(name for record in records for name in record))
+    arrays = []
+    for name in names:
+        values = [record.get(name) for record in records]
+        try:
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed values in one column, e.g. numbers and text, are kept as text
+            arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+    return pa.table(arrays, names=names)
+
+
+def apply_types(table: pa.Table, dtypes: dict[str, str] | None) -> pa.Table:
+    for name, arrow_type in arrow_types(dtypes).items():
+        if name not in table.column_names:
+            continue
+        if pa.types.is_dictionary(arrow_type):
+            column = pc.dictionary_encode(table[name].cast(pa.string()))
+        else:
+            column = table[name].cast(arrow_type)
+        table = table.set_column(table.column_names.index(name), name, column)
+    return table
+
+
+def unify_tables(tables: list[pa.Table]) -> pa.Table:
+    # Batches can miss columns, which become null, or disagree on a type, which makes the column text
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        pass
+    types: dict[str, set] = {}
+    for table in tables:
+        for field in table.schema:
+            types.setdefault(field.name, set()).add(field.type)
+    text = {name for name, found in types.items() if len(found - {pa.null()}) > 1}
+    tables = [table.cast(pa.schema([pa.field(f.name, pa.string() if f.name in text else f.type) for f in table.schema]))
+              for table in tables]
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def iter_json_tables(file: pathlib.Path, batch_size: int, usecols: list[str] | None = None,
+                     dtypes: dict[str, str] | None = None, start: int = 0) -> Iterator[pa.Table]:
+    records = []
+    for value in iter_json_values(file, start):
+        records.append(flatten_record(value))
+        if len(records) == batch_size:
+            yield apply_types(records_table(records, usecols), dtypes)
+            records = []
+    if records:
+        yield apply_types(records_table(records, usecols), dtypes)
+
+
+def resumable(file: pathlib.Path) -> bool:
+    # Files that can be read from a byte offset: uncompressed files with one row or record per line
+    return compression(file) is None and table_extension(file) in (".csv", ".tsv") + JSON_LINES_EXTENSIONS
+
+
+def iter_batches(file: click.Path, batch_size: int = 100_000, start: int = 0, usecols: list[str] | None = None,
+                 dtypes: dict[str, str] | None = None) -> Iterator[pd.DataFrame]:
+    # start skips the first bytes of the file, e.g. rows that were already profiled, and must be the start of a line
+    file = pathlib.Path(file).absolute()
+    ext = table_extension(file)
+    if ext not in TABLE_EXTENSIONS:
+        raise ValueError(f'Streaming is only supported for .csv, .tsv, .json and .jsonl files, not {file.name}')
+    if start and not resumable(file):
+        raise ValueError(f'Cannot resume reading {file.name} at an offset')
+    if ext not in (".csv", ".tsv"):
+        for table in iter_json_tables(file, batch_size, usecols, dtypes, start):
+            yield arrow_to_pandas(table)
+        return
+
+    delimiter, header = sniff(file)
+    names = column_names(file, delimiter, header)
+    read_options = pa_csv.ReadOptions(block_size=STREAM_BLOCK_SIZE)
+    if start or not header:
+        read_options.column_names = names
+    types = arrow_types(dtypes)
+    rows = 0
 
+    # The column types are guessed from the first block. When a later value does not fit, e.g. 1.5 in an int
+    # column, the file is read again with the column widened and the rows that were already returned are skipped.
+    while True:
+        with open_input(file) as stream:
+            if start:
+                stream.seek(start)
+            reader = pa_csv.open_csv(stream, read_options=read_options,
+                                     convert_options=convert_options(usecols, types),
+                                     parse_options=pa_csv.ParseOptions(delimiter=delimiter))
+            skip = rows
+            try:
+                for batch in reader:
+                    if skip >= batch.num_rows:
+                        skip -= batch.num_rows
+                        continue
+                    batch, skip = batch.slice(skip), 0
+                    for offset in range(0, batch.num_rows, batch_size):
+                        chunk = batch.slice(offset, batch_size)
+                        rows += chunk.num_rows
+                        yield arrow_to_pandas(pa.Table.from_batches([chunk]))
+                return
+            except pa.ArrowInvalid as error:
+                match = CONVERSION_ERROR.search(str(error))
+                # Types given with --dtype are kept, values that do not fit them are an error
+                if match is None or names[int(match.group(1))] in (dtypes or {}):
+                    raise
+                name = names[int(match.group(1))]
+                found = reader.schema.field(name).type
+        if pa.types.is_integer(found) or pa.types.is_null(found):
+            # Earlier batches stay valid, ints are read as floats and missing values as text from now on
+            widened = pa.float64() if pa.types.is_integer(found) else pa.string()
+            types = {**{field.name: field.type for field in reader.schema}, name: widened}
+        else:
+            # Numbers, booleans or dates read so far cannot become text afterwards, the caller starts over
+            raise ColumnTypesChanged(file, {name: "string"})
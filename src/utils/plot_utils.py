@@ -0,0 +1,136 @@
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+from plotly.utils import PlotlyJSONEncoder
+
+# Upper bounds on the data embedded in a figure, independent of the number of rows
+MISSING_MATRIX_ROWS = 500
+SCATTER_SAMPLE_ROWS = 5_000
+BOX_OUTLIERS = 200
+HISTOGRAM_BINS = 10
+# Most bars of a histogram with one bar per value, the most frequent values are kept and the rest share one bar
+HISTOGRAM_BARS = 50
+
+
+def missing_blocks(df: pd.DataFrame, max_rows: int = MISSING_MATRIX_ROWS) -> pd.DataFrame:
+    # Fraction of missing cells per column in consecutive row blocks, one block per row for small frames
+    missing = df.isna().to_numpy()
+    rows = missing.shape[0]
+    if rows <= max_rows:
+        return pd.DataFrame(missing.astype("float64"), columns=df.columns)
+    starts = np.linspace(0, rows, max_rows + 1).astype(np.int64)[:-1]
+    sizes = np.diff(np.r_[starts, rows])
+    fractions = np.add.reduceat(missing, starts, axis=0, dtype=np.int64) / sizes[:, None]
+    labels = [f"{start}-{start + size - 1}" for start, size in zip(starts.tolist(), sizes.tolist())]
+    return pd.DataFrame(fractions, columns=df.columns, index=labels)
+
+
+def sample_rows(df: pd.DataFrame, max_rows: int = SCATTER_SAMPLE_ROWS, by: str | None = None,
+                seed: int = 0) -> pd.DataFrame:
+    if len(df) <= max_rows:
+        return df
+    if by is None:
+        return df.sample(max_rows, random_state=seed).sort_index()
+    # Stratified: every class keeps its share of the rows. Classes too small for a share get one row each,
+    # the largest of them first, as long as the sample stays within max_rows
+    codes = df.groupby(by, dropna=False, sort=False).ngroup().to_numpy()
+    sizes = np.bincount(codes)
+    quota = sizes * max_rows // len(df)
+    small = np.flatnonzero(quota == 0)
+    small = small[np.argsort(-sizes[small], kind="stable")][:max_rows - quota.sum()]
+    quota[small] = 1
+    # Rows in random order, grouped by class and numbered within their class
+    order = np.random.default_rng(seed).permutation(len(df))
+    order = order[np.argsort(codes[order], kind="stable")]
+    starts = np.cumsum(sizes) - sizes
+    rank = np.arange(len(df)) - starts[codes[order]]
+    return df.iloc[np.sort(order[rank < quota[codes[order]]])]
+
+
+@dataclass
+class BoxStatistics:
+    name: str
+    q1: float
+    median: float
+    q3: float
+    lower_fence: float
+    upper_fence: float
+    mean: float
+    # Evenly spaced sample of the sorted outliers, always including the most extreme ones
+    outliers: np.ndarray
+    n_outliers: int
+
+
+def box_statistics(values: pd.Series, max_outliers: int = BOX_OUTLIERS) -> BoxStatistics | None:
+    ordered = np.sort(values.dropna().to_numpy(dtype="float64"))
+    if ordered.size == 0:
+        return None
+    q1, median, q3 = np.quantile(ordered, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    # Tukey whiskers reach the most extreme values within 1.5 IQR of the box
+    low = np.searchsorted(ordered, q1 - 1.5 * iqr, side="left")
+    high = np.searchsorted(ordered, q3 + 1.5 * iqr, side="right")
+    outliers = np.r_[ordered[:low], ordered[high:]]
+    if outliers.size > max_outliers:
+        outliers = outliers[np.linspace(0, outliers.size - 1, max_outliers).astype(np.int64)]
+    return BoxStatistics(
+        name=str(values.name),
+        q1=float(q1),
+        median=float(median),
+        q3=float(q3),
+        lower_fence=float(ordered[min(low, ordered.size - 1)]),
+        upper_fence=float(ordered[max(high - 1, 0)]),
+        mean=float(ordered.mean()),
+        outliers=outliers,
+        n_outliers=int(low + ordered.size - high)
+    )
+
+
+def histogram_counts(values: pd.Series, unique: int, bins: int = HISTOGRAM_BINS,
+                     max_bars: int = HISTOGRAM_BARS) -> tuple[np.ndarray, np.ndarray, np.ndarray | None]:
+    # Returns bar positions, counts and widths. Few distinct or non-numeric values get one bar per value
+    values = values.dropna()
+    if unique >= bins and pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        counts, edges = np.histogram(values.to_numpy(dtype="float64"), bins=bins)
+        return (edges[:-1] + edges[1:]) / 2, counts, np.diff(edges)
+    if unique >= bins and pd.api.types.is_datetime64_any_dtype(values):
+        # Binned as nanoseconds since the epoch, plotly expects the widths of bars on a date axis in milliseconds
+        times = pd.DatetimeIndex(values).as_unit("ns")
+        counts, edges = np.histogram(times.asi8, bins=bins)
+        centers = pd.to_datetime(((edges[:-1] + edges[1:]) / 2).astype("int64"), unit="ns", utc=times.tz is not None)
+        if times.tz is not None:
+            centers = centers.tz_convert(times.tz)
+        return centers.to_numpy(), counts, np.diff(edges) / 1e6
+    counts = values.value_counts()
+    if len(counts) <= max_bars:
+        counts = counts.sort_index()
+        return counts.index.to_numpy(), counts.to_numpy(), None
+    shown = counts.head(max_bars).sort_index()
+    other = f"Other ({len(counts) - max_bars} values)"
+    return (np.append(shown.index.to_numpy(dtype=object), other),
+            np.append(shown.to_numpy(), counts.iloc[max_bars:].sum()), None)
+
+
+def figure_html(fig) -> str:
+    # Compact figure JSON for static/js/plots.js, which draws the figure when it scrolls into view.
+    # The default template is written once to static/js/plot_template.js instead of into every figure,
+    # and "</" is escaped, so a label cannot close the surrounding script tag.
+    if fig.layout.template == pio.templates[pio.templates.default]:
+        fig = go.Figure(fig)
+        fig.layout.template = None
+    payload = fig.to_json().replace("</", "<\\/")
+    return f'<div class="lazy-plot"><script type="application/json">{payload}</script></div>'
+
+
+def write_plotlyjs(directory: Path):
+    # plotly.js ships with the plotly package, so the report loads it from disk and works offline
+    (directory / "plotly.min.js").write_text(get_plotlyjs(), encoding="utf-8")
+    template = pio.templates[pio.templates.default].to_plotly_json()
+    (directory / "plot_template.js").write_text(f"window.PLOT_TEMPLATE = {json.dumps(template, cls=PlotlyJSONEncoder)};\n",
+                                                encoding="utf-8")
@@ -0,0 +1,197 @@
+import dataclasses
+import importlib
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from enum import Enum
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+PROFILE_FORMAT = "bioprofilekit-profile"
+# Increase when a reader of the previous version can no longer read the profile
+PROFILE_VERSION = 1
+# Only classes from these packages are created again when a profile is read
+TRUSTED_MODULES = ("qc_eda.",)
+TABLES = ("columns", "numeric", "categorical")
+
+
+@dataclass
+class Profile:
+    general: Any
+    duplicates_table: str
+    plots: Any
+    columns: list
+    numeric: list
+    categorical: list
+
+
+def encode(value: Any) -> Any:
+    # JSON compatible form of a result, dataclasses keep their class and also attributes that were added after creation
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        cls = type(value)
+        return {"__type__": f"{cls.__module__}:{cls.__qualname__}",
+                "fields": {name: encode(item) for name, item in vars(value).items()}}
+    if isinstance(value, Enum):
+        return encode(value.value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return {"__ndarray__": encode(value.tolist()), "dtype": str(value.dtype)}
+    if isinstance(value, pd.Series):
+        return {"__series__": encode(value.tolist()), "index": encode(value.index.tolist()), "name": encode(value.name),
+                "dtype": str(value.dtype)}
+    if isinstance(value, pd.DataFrame):
+        return {"__frame__": encode(value.to_dict(orient="split"))}
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: encode(item) for key, item in value.items()}
+        return {"__dict__": [[encode(key), encode(item)] for key, item in value.items()]}
+    if isinstance(value, (set, frozenset)):
+        return {"__set__": [encode(item) for item in value], "frozen": isinstance(value, frozenset)}
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode(item) for item in value]}
+    if isinstance(value, list):
+        return [encode(item) for item in value]
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    raise ValueError(f"Cannot store value of type {type(value).__name__} in a profile")
+
+
+def decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "__type__" in value:
+        cls = _resolve(value["__type__"])
+        result = cls.__new__(cls)
+        # Frozen dataclasses do not allow setattr, so the fields are written to the instance dict directly
+        result.__dict__.update({name: decode(item) for name, item in value["fields"].items()})
+        return result
+    if "__ndarray__" in value:
+        return np.array(decode(value["__ndarray__"]), dtype=value["dtype"])
+    if "__series__" in value:
+        return pd.Series(decode(value["__series__"]), index=decode(value["index"]), name=decode(value["name"]),
+                         dtype=value["dtype"])
+    if "__frame__" in value:
+        return pd.DataFrame(**decode(value["__frame__"]))
+    if "__dict__" in value:
+        return {_hashable(decode(key)): decode(item) for key, item in value["__dict__"]}
+    if "__set__" in value:
+        items = [_hashable(decode(item)) for item in value["__set__"]]
+        return frozenset(items) if value["frozen"] else set(items)
+    if "__tuple__" in value:
+        return tuple(decode(item) for item in value["__tuple__"])
+    return {key: decode(item) for key, item in value.items()}
+
+
+def _hashable(value: Any) -> Any:
+    return tuple(_hashable(item) for item in value) if isinstance(value, list) else value
+
+
+def _resolve(name: str) -> type:
+    module, _, qualname = name.partition(":")
+    if not module.startswith(TRUSTED_MODULES):
+        raise ValueError(f"Profile refers to class {name} outside of {', '.join(TRUSTED_MODULES)}")
+    cls = importlib.import_module(module)
+    for part in qualname.split("."):
+        cls = getattr(cls, part)
+    return cls
+
+
+def _is_plain(values: list) -> bool:
+    # Fields with one Python scalar type and no missing values are stored as native Parquet columns
+    kinds = {type(value) for value in values}
+    return len(kinds) == 1 and kinds <= {str, bool, int, float}
+
+
+def records_frame(records: list) -> tuple[pd.DataFrame, list[str]]:
+    # One row per result and one column per attribute, attributes that are not plain scalars are stored as JSON text
+    encoded = [encode(record) for record in records]
+    types = [record["__type__"] for record in encoded]
+    names = list(dict.fromkeys(name for record in encoded for name in record["fields"]))
+    columns: dict[str, list] = {"__type__": types}
+    json_fields = []
+    for name in names:
+        present = [name in record["fields"] for record in encoded]
+        values = [record["fields"].get(name) for record in encoded]
+        if all(present) and _is_plain(values):
+            columns[name] = values
+        else:
+            json_fields.append(name)
+            columns[name] = [json.dumps(value) if has else None for value, has in zip(values, present)]
+    return pd.DataFrame(columns), json_fields
+
+
+def frame_records(df: pd.DataFrame, json_fields: list[str]) -> list:
+    fields = [name for name in df.columns if name != "__type__"]
+    values = {name: df[name].tolist() for name in fields}
+    records = []
+    for i, type_name in enumerate(df["__type__"].tolist()):
+        record = {}
+        for name in fields:
+            value = values[name][i]
+            if name in json_fields:
+                if value is None:
+                    continue
+                value = json.loads(value)
+            record[name] = value
+        records.append(decode({"__type__": type_name, "fields": record}))
+    return records
+
+
+def write_profile(directory: Path, profile: Profile, source: str):
+    # manifest.json with the table layout and the small results, plus one Parquet file per list of column results
+    directory.mkdir(parents=True, exist_ok=True)
+    tables = {}
+    for table in TABLES:
+        df, json_fields = records_frame(getattr(profile, table))
+        path = directory / f"{table}.parquet"
+        _replace(path, lambda tmp: df.to_parquet(tmp, index=False))
+        tables[table] = {"file": path.name, "rows": len(df), "json_fields": json_fields}
+    manifest = {
+        "format": PROFILE_FORMAT,
+        "version": PROFILE_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "source": source,
+        "general": encode(profile.general),
+        "plots": encode(profile.plots),
+        "duplicates_table": profile.duplicates_table,
+        "tables": tables,
+    }
+    _replace(directory / "manifest.json",
+             lambda tmp: tmp.write_text(json.dumps(manifest, indent=1), encoding="utf-8"))
+
+
+def read_profile(directory: Path) -> Profile:
+    manifest_path = directory / "manifest.json"
+    if not manifest_path.is_file():
+        raise FileNotFoundError(f"No profile manifest in {directory}")
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("format") != PROFILE_FORMAT:
+        raise ValueError(f"{manifest_path} is not a BioProfileKit profile")
+    if manifest["version"] > PROFILE_VERSION:
+        raise ValueError(f"Profile version {manifest['version']} is newer than the supported version {PROFILE_VERSION}")
+    tables = {table: frame_records(pd.read_parquet(directory / spec["file"]), spec["json_fields"])
+              for table, spec in manifest["tables"].items()}
+    return Profile(
+        general=decode(manifest["general"]),
+        duplicates_table=manifest["duplicates_table"],
+        plots=decode(manifest["plots"]),
+        columns=tables["columns"],
+        numeric=tables["numeric"],
+        categorical=tables["categorical"]
+    )
+
+
+def _replace(path: Path, write):
+    # Write to a sibling file first, so readers never see a half written profile file
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
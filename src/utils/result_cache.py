@@ -0,0 +1,120 @@
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+import pandas as pd
+import pyarrow as pa
+
+from utils.cache import cache_path
+from utils.scheduler import map_columns
+
+# Part of every key, increase it when the layout of a cached result changes
+RESULT_CACHE_VERSION = 1
+# Bytes read at once when hashing the already profiled part of a file
+PREFIX_BLOCK_SIZE = 16 << 20
+
+
+class ResultCache:
+    # Pickled results in <cache dir>/results/<first two key characters>/<key>.pkl
+    def __init__(self, directory: Path | None = None):
+        self.directory = directory if directory is not None else cache_path("results")
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.pkl"
+
+    def get(self, key: str) -> Any | None:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as fh:
+                value = pickle.load(fh)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a sibling file first, so concurrent runs never see a half written result
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as fh:
+            pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+
+def column_digest(series: pd.Series) -> str:
+    # Hash of the Arrow buffers of the column, so equal columns hash equally without touching every value in Python.
+    # Columns Arrow cannot represent, like mixed object columns, are hashed row by row with pandas instead.
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{series.name!r}|{series.dtype}|{len(series)}".encode("utf-8"))
+    try:
+        array = pa.array(series, from_pandas=True)
+    except (pa.ArrowException, TypeError, ValueError):
+        digest.update(pd.util.hash_pandas_object(series, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+    chunks = array.chunks if isinstance(array, pa.ChunkedArray) else [array]
+    for chunk in chunks:
+        # Buffers of a slice also hold the values around it, so the slice position is part of the hash
+        digest.update(f"{chunk.type}|{chunk.offset}|{len(chunk)}".encode("utf-8"))
+        buffers = chunk.buffers()
+        if pa.types.is_dictionary(chunk.type):
+            # buffers() only covers the indices of a dictionary array
+            buffers += chunk.dictionary.buffers()
+        for buffer in buffers:
+            digest.update(b"-" if buffer is None else buffer)
+    return digest.hexdigest()
+
+
+def result_key(*parts) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((RESULT_CACHE_VERSION,) + parts).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _parameter(value) -> str:
+    # Reference tables are identified by the checksum they were downloaded with, not by their content,
+    # and objects with a digest method, like the column catalog, by their digest
+    if isinstance(value, pd.DataFrame):
+        return f"frame:{value.attrs.get('checksum', id(value))}"
+    if callable(getattr(value, "digest", None)):
+        return f"{type(value).__name__}:{value.digest()}"
+    return repr(value)
+
+
+def map_cached(task: Callable, df: pd.DataFrame, columns: Iterable, jobs: int | None = 1,
+               cache: ResultCache | None = None, digests: dict | None = None, **kwargs) -> list:
+    # Same as map_columns, but results of columns whose content and parameters are unchanged come from the cache
+    columns = list(columns)
+    if cache is None:
+        return map_columns(task, df, columns, jobs, **kwargs)
+
+    parameters = tuple(sorted((name, _parameter(value)) for name, value in kwargs.items()))
+    keys = [result_key(task.__module__, task.__qualname__, parameters,
+                       digests[col] if digests is not None else column_digest(df[col]))
+            for col in columns]
+    results = [cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        computed = map_columns(task, df, [columns[i] for i in missing], jobs, **kwargs)
+        for i, result in zip(missing, computed):
+            cache.put(keys[i], result)
+            results[i] = result
+    return results
+
+
+def file_prefix_digest(path: Path, size: int) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        remaining = size
+        while remaining > 0:
+            block = fh.read(min(PREFIX_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
@@ -0,0 +1,44 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+
+import pandas as pd
+
+# Frame and keyword arguments of the running map_columns call. Forked workers inherit this
+# state from the parent, so neither the frame nor reference tables are pickled per task.
+_SHARED: dict[str, Any] = {}
+
+
+def _run_column(task: Callable, col) -> Any:
+    kwargs = dict(_SHARED)
+    df = kwargs.pop("df")
+    return task(df, col, **kwargs)
+
+
+def resolve_jobs(jobs: int | None) -> int:
+    if jobs is None or jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+# Runs task(df, col, **kwargs) for every column and returns the results in column order.
+# With more than one job the columns are spread over forked worker processes, which share
+# the frame copy-on-write. Platforms without fork fall back to a thread pool.
+def map_columns(task: Callable, df: pd.DataFrame, columns: Iterable, jobs: int | None = 1, **kwargs) -> list:
+    columns = list(columns)
+    jobs = min(resolve_jobs(jobs), len(columns))
+    if jobs <= 1:
+        return [task(df, col, **kwargs) for col in columns]
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        _SHARED.update(kwargs, df=df)
+        try:
+            with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("fork")) as pool:
+                chunksize = max(1, len(columns) // (jobs * 4))
+                return list(pool.map(_run_column, [task] * len(columns), columns, chunksize=chunksize))
+        finally:
+            _SHARED.clear()
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(lambda col: task(df, col, **kwargs), columns))
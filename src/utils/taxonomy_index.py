@@ -0,0 +1,145 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Part of the index directory name, increase it when the layout of the arrays changes
+INDEX_VERSION = 1
+ARRAYS = ("ids", "parents", "ranks", "scientific_offsets", "scientific_data",
+          "name_hashes", "name_ids", "name_classes")
+# Lineages stop after this many parents, the NCBI tree is far less deep
+MAX_LINEAGE = 100
+
+
+def normalize_names(names: pd.Series) -> pd.Series:
+    # Case and runs of whitespace do not distinguish taxonomy names
+    return names.astype(str).str.strip().str.replace(r"\s+", " ", regex=True).str.casefold()
+
+
+def name_hashes(names: pd.Series) -> np.ndarray:
+    # Unique values are normalized and hashed once, so columns with many repeated names stay cheap
+    codes, uniques = pd.factorize(names)
+    hashes = pd.util.hash_array(normalize_names(pd.Series(uniques, dtype=object)).to_numpy(dtype=object),
+                                categorize=False)
+    result = np.zeros(len(codes), dtype=np.uint64)
+    result[codes >= 0] = hashes[codes[codes >= 0]]
+    return result
+
+
+def _encode_strings(values: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    encoded = [value.encode("utf-8") for value in values.astype(str)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def build_taxonomy_index(names: pd.DataFrame, nodes: pd.DataFrame | None, directory: Path, checksum: str) -> Path:
+    # Sorted arrays in .npy files, so the index is memory-mapped by every run and shared by forked workers
+    scientific = names[names["name_class"] == "scientific name"].drop_duplicates("tax_id").set_index("tax_id")["name_txt"]
+    if nodes is None:
+        # Caches written before nodes.dmp was kept have no parents and ranks
+        nodes = pd.DataFrame({"tax_id": names["tax_id"].unique(), "parent_tax_id": -1, "rank": "no rank"})
+    nodes = nodes.drop_duplicates("tax_id").sort_values("tax_id")
+    rank_codes, rank_names = pd.factorize(nodes["rank"].astype(str))
+    scientific_offsets, scientific_data = _encode_strings(scientific.reindex(nodes["tax_id"]).fillna(""))
+
+    hashes = name_hashes(names["name_txt"])
+    class_codes, class_names = pd.factorize(names["name_class"].astype(str))
+    order = np.lexsort((class_codes, names["tax_id"].to_numpy(), hashes))
+    arrays = {
+        "ids": nodes["tax_id"].to_numpy(dtype=np.int64),
+        "parents": nodes["parent_tax_id"].to_numpy(dtype=np.int64),
+        "ranks": rank_codes.astype(np.int16),
+        "scientific_offsets": scientific_offsets,
+        "scientific_data": scientific_data,
+        "name_hashes": hashes[order],
+        "name_ids": names["tax_id"].to_numpy(dtype=np.int64)[order],
+        "name_classes": class_codes.astype(np.int16)[order],
+    }
+
+    tmp_dir = directory.with_name(directory.name + f".{os.getpid()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    for name, array in arrays.items():
+        np.save(tmp_dir / f"{name}.npy", array)
+    meta = {"version": INDEX_VERSION, "checksum": checksum, "ranks": list(rank_names), "name_classes": list(class_names)}
+    (tmp_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+    # The directory only appears once it is complete
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+    return directory
+
+
+class TaxonomyIndex:
+    def __init__(self, directory: Path):
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        if meta["version"] != INDEX_VERSION:
+            raise ValueError(f"Taxonomy index {directory} has version {meta['version']}, expected {INDEX_VERSION}")
+        self.directory = directory
+        self.checksum = meta["checksum"]
+        self.rank_names = meta["ranks"]
+        self.class_names = meta["name_classes"]
+        for name in ARRAYS:
+            setattr(self, name, np.load(directory / f"{name}.npy", mmap_mode="r"))
+
+    def __repr__(self) -> str:
+        # Identifies the dump version, e.g. in the keys of cached column results
+        return f"TaxonomyIndex({self.checksum})"
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _positions(self, tax_ids) -> tuple[np.ndarray, np.ndarray]:
+        tax_ids = np.asarray(tax_ids, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.ids, tax_ids), len(self.ids) - 1)
+        return positions, self.ids[positions] == tax_ids
+
+    def has_ids(self, tax_ids) -> np.ndarray:
+        return self._positions(tax_ids)[1]
+
+    def has_names(self, names: pd.Series) -> np.ndarray:
+        hashes = name_hashes(names)
+        positions = np.minimum(np.searchsorted(self.name_hashes, hashes), len(self.name_hashes) - 1)
+        return (self.name_hashes[positions] == hashes) & names.notna().to_numpy()
+
+    def lookup(self, names: pd.Series) -> pd.DataFrame:
+        # Every tax ID a normalized name belongs to, with the class of the name (scientific name, synonym, ...)
+        hashes = name_hashes(names)
+        start = np.searchsorted(self.name_hashes, hashes, side="left")
+        end = np.searchsorted(self.name_hashes, hashes, side="right")
+        end[names.isna().to_numpy()] = start[names.isna().to_numpy()]
+        rows = np.repeat(np.arange(len(names)), end - start)
+        matches = np.concatenate([np.arange(s, e) for s, e in zip(start, end)]) if len(rows) else np.array([], dtype=np.int64)
+        return pd.DataFrame({
+            "name": names.to_numpy()[rows],
+            "tax_id": np.asarray(self.name_ids[matches]),
+            "name_class": pd.Categorical.from_codes(np.asarray(self.name_classes[matches]), self.class_names),
+        })
+
+    def scientific_name(self, tax_id: int) -> str | None:
+        positions, found = self._positions([tax_id])
+        if not found[0]:
+            return None
+        start, end = self.scientific_offsets[positions[0]], self.scientific_offsets[positions[0] + 1]
+        return bytes(self.scientific_data[start:end]).decode("utf-8") or None
+
+    def rank(self, tax_id: int) -> str | None:
+        positions, found = self._positions([tax_id])
+        return self.rank_names[self.ranks[positions[0]]] if found[0] else None
+
+    def lineage(self, tax_id: int) -> list[tuple[int, str, str | None]]:
+        # (tax ID, rank, scientific name) from the root down to tax_id
+        lineage = []
+        while len(lineage) < MAX_LINEAGE:
+            positions, found = self._positions([tax_id])
+            if not found[0]:
+                break
+            lineage.append((int(tax_id), self.rank(tax_id), self.scientific_name(tax_id)))
+            parent = int(self.parents[positions[0]])
+            if parent == tax_id or parent < 0:
+                break
+            tax_id = parent
+        return lineage[::-1]
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from qc_eda.basic import duplicates
+from qc_eda.basic.duplicates import find_duplicates, duplicates_table
+
+
+def test_table_with_group_and_index_columns():
+    df = pd.DataFrame({"Group": ["a", "a", "b"], "Group size": [1, 1, 2], "index": [0, 0, 1]})
+    duplicates = find_duplicates(df)
+    assert duplicates.duplicate_rows == 1
+    assert list(duplicates.sample_groups) == [1, 1]
+    assert list(duplicates.sample.columns) == ["Group", "Group size", "index"]
+    assert "dup_table" in duplicates_table(duplicates)
+
+
+def test_rows_and_columns_with_colliding_hashes(monkeypatch):
+    df = pd.DataFrame({"a": [1.0, 2.0, 1.0, None, 2.0, None], "b": ["x", "y", "x", None, "y", None],
+                       "c": [1.0, 2.0, 1.0, 3.0, 2.0, 3.0]}).astype({"b": "string[pyarrow]"})
+    # Every row and every column gets the same hash
+    monkeypatch.setattr(duplicates, "table_hashes", lambda df: (np.zeros(len(df), dtype=np.uint64), [0] * df.shape[1]))
+    result = find_duplicates(df)
+    assert result.duplicate_rows == df.duplicated().sum() == 3
+    assert result.groups == 3
+    assert result.group_sizes == {2: 3}
+    assert result.duplicate_columns == []
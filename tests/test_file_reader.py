@@ -0,0 +1,13 @@
+import pandas as pd
+
+from utils.file_reader import read_file, iter_batches
+
+
+def test_empty_and_na_text_cells_are_missing(tmp_path):
+    file = tmp_path / "table.csv"
+    file.write_text('id,category\n1,a\n2,\n3,NA\n4,""\n5,b\n')
+    expected = [False, True, True, True, False]
+    df = read_file(file)
+    assert df["category"].isna().tolist() == expected
+    streamed = pd.concat(list(iter_batches(file, batch_size=2)))
+    assert streamed["category"].isna().tolist() == expected
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+from utils.plot_utils import sample_rows, histogram_counts
+
+
+def test_stratified_sample_stays_within_max_rows():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"target": rng.integers(0, 20_000, 100_000), "x": rng.normal(size=100_000)})
+    sample = sample_rows(df, 5_000, by="target")
+    assert len(sample) == 5_000
+    assert sample.index.is_unique
+
+
+def test_rare_classes_are_kept():
+    df = pd.DataFrame({"target": ["a"] * 9_990 + ["b"] * 10})
+    assert set(sample_rows(df, 100, by="target")["target"]) == {"a", "b"}
+
+
+def test_values_beyond_the_bars_share_one_bar():
+    values = pd.Series([f"v{i}" for i in range(60) for _ in range(i + 1)])
+    x, counts, _ = histogram_counts(values, 60, max_bars=50)
+    assert len(x) == 51 and x[-1] == "Other (10 values)"
+    assert counts.sum() == len(values)
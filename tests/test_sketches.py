@@ -0,0 +1,18 @@
+import numpy as np
+
+from qc_eda.basic.sketches import KLLSketch
+
+
+def test_merged_kll_rank_error_within_bound():
+    # One sketch per batch merged into the total, as in streaming mode
+    rng = np.random.default_rng(1)
+    batches = [rng.normal(size=5000) for _ in range(200)]
+    sketch = KLLSketch()
+    for batch in batches:
+        sketch = sketch.merge(KLLSketch().update(batch))
+
+    ordered = np.sort(np.concatenate(batches))
+    probs = np.linspace(0.01, 0.99, 99)
+    ranks = np.searchsorted(ordered, sketch.quantiles(probs), side="right") / ordered.size
+    assert sketch.count == ordered.size
+    assert np.abs(ranks - probs).max() <= sketch.error